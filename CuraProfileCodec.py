@@ -0,0 +1,87 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import io
+import zipfile
+
+from typing import Dict, Iterable, List, Tuple
+
+# A profile is a dict of sections ([general], [metadata], [values]) of key / value strings
+ProfileSections = Dict[str, Dict[str, str]]
+
+_SECTION_ORDER = ("general", "metadata", "values")
+
+
+def parseProfile(lines: Iterable[str]) -> ProfileSections:
+    """Parse the INI content of a profile.
+
+    Dedicated to the files written by Cura : one key = value per line, multi-line values
+    continued by indented lines, comments starting with # or ;.
+    """
+    sections = {}  # type: ProfileSections
+    current = None  # type: Dict[str, str]
+    last_key = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if line[0] in " \t":
+            # Continuation of a multi-line value
+            if current is not None and last_key is not None:
+                current[last_key] += "\n" + stripped
+            continue
+        if stripped[0] in "#;":
+            continue
+        if stripped[0] == "[" and stripped[-1] == "]":
+            current = sections.setdefault(stripped[1:-1].strip(), {})
+            last_key = None
+            continue
+        if current is None:
+            raise ValueError("Value outside of a section : %s" % stripped)
+        key, separator, value = stripped.partition("=")
+        if not separator:
+            raise ValueError("Invalid line : %s" % stripped)
+        last_key = key.strip().lower()
+        current[last_key] = value.strip()
+    return sections
+
+
+def serializeProfile(sections: ProfileSections) -> str:
+    """Write a profile in the INI format used by Cura for the containers."""
+    output = io.StringIO()
+    names = [name for name in _SECTION_ORDER if name in sections] + [name for name in sections if name not in _SECTION_ORDER]
+    for name in names:
+        output.write("[%s]\n" % name)
+        for key, value in sections[name].items():
+            output.write("%s = %s\n" % (key, str(value).replace("\n", "\n\t")))
+        output.write("\n")
+    return output.getvalue()
+
+
+def readCuraProfile(file_name: str) -> List[Tuple[str, ProfileSections]]:
+    """Read every profile of a .curaprofile file.
+
+    The zip members are streamed line by line through parseProfile.
+
+    :return: List of (member name, sections), in the order of the archive.
+    """
+    profiles = []  # type: List[Tuple[str, ProfileSections]]
+    with zipfile.ZipFile(file_name) as archive:
+        for member_info in archive.infolist():
+            if member_info.is_dir():
+                continue
+            with archive.open(member_info) as member:
+                profiles.append((member_info.filename, parseProfile(io.TextIOWrapper(member, encoding = "utf-8"))))
+    return profiles
+
+
+def writeCuraProfile(file_name: str, profiles: Iterable[Tuple[str, str]]) -> None:
+    """Write a .curaprofile file.
+
+    :param profiles: List of (member name, serialized profile). The member name is the id of
+        the profile, as written by Cura.
+    """
+    with zipfile.ZipFile(file_name, "w", compression = zipfile.ZIP_DEFLATED) as archive:
+        for member_name, serialized in profiles:
+            archive.writestr(zipfile.ZipInfo(member_name), serialized, compress_type = zipfile.ZIP_DEFLATED)
@@ -0,0 +1,123 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import math
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from UM.Logger import Logger
+from UM.Settings.SettingFunction import SettingFunction
+
+from .ProfileModel import ProfileTable
+from .QualityResolver import QualityResolver
+from .SettingValidation import SettingIndex, checkValue
+
+
+def _toFloat(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class MachineFacts:
+    """What the analysis needs to know of a printer, read once on the main thread."""
+
+    __slots__ = ("name", "index", "extruder_count", "limits", "enabled", "qualities")
+
+    def __init__(self, name: str, index: SettingIndex, extruder_count: int) -> None:
+        self.name = name
+        self.index = index
+        self.extruder_count = extruder_count
+        # (extruder, key) -> (minimum, maximum), NaN if not defined
+        self.limits = {}  # type: Dict[Tuple[int, str], Tuple[float, float]]
+        # (extruder, key) -> enabled
+        self.enabled = {}  # type: Dict[Tuple[int, str], bool]
+        # Quality type of a profile -> quality type used on this printer, None if none
+        self.qualities = {}  # type: Dict[str, Optional[str]]
+
+
+class PairResult:
+    """Compatibility of one profile with one printer."""
+
+    __slots__ = ("profile", "machine", "applicable", "rejected", "disabled", "quality_type", "substitute")
+
+    def __init__(self, profile: str, machine: str, quality_type: str, substitute: Optional[str]) -> None:
+        self.profile = profile
+        self.machine = machine
+        self.applicable = 0
+        self.rejected = []  # type: List[str]
+        self.disabled = []  # type: List[str]
+        self.quality_type = quality_type
+        self.substitute = substitute
+
+
+def readMachineFacts(machine, keys: Set[Tuple[int, str]], quality_types: Set[str], resolver: QualityResolver) -> MachineFacts:
+    """Evaluate on a printer the properties of the keys used by the profiles, without modifying it."""
+    extruders = machine.extruderList
+    facts = MachineFacts(machine.getName(), SettingIndex.forStack(machine), len(extruders))
+    for extrud, kkey in keys:
+        if extrud >= len(extruders) or not facts.index.hasKey(kkey):
+            continue
+        extruder = extruders[extrud]
+        facts.limits[(extrud, kkey)] = (_toFloat(extruder.getProperty(kkey, "minimum_value")), _toFloat(extruder.getProperty(kkey, "maximum_value")))
+        facts.enabled[(extrud, kkey)] = bool(extruder.getProperty(kkey, "enabled"))
+    for quality_type in quality_types:
+        try:
+            facts.qualities[quality_type] = resolver.resolve(machine, quality_type)
+        except Exception:
+            Logger.logException("w", "Could not resolve the quality %s for %s", quality_type, facts.name)
+            facts.qualities[quality_type] = None
+    return facts
+
+
+def comparePair(profile_name: str, table: ProfileTable, facts: MachineFacts) -> PairResult:
+    """Check the rows of a profile against the facts of a printer. Only reads plain data."""
+    quality_type = table.getGeneral("Quality_Type")
+    result = PairResult(profile_name, facts.name, quality_type, facts.qualities.get(quality_type) if quality_type else None)
+    index = facts.index
+    for row in table.rows:
+        kkey, extrud, ktype, kvalue = row.key, row.extruder, row.type, row.value
+        setting_type = index.getType(kkey)
+        if setting_type is None or setting_type == "category":
+            result.rejected.append("%s : unknown" % kkey)
+            continue
+        if extrud < 0 or extrud >= facts.extruder_count:
+            result.rejected.append("%s : no extruder %d" % (kkey, extrud + 1))
+            continue
+        # The same checks as the import
+        error = checkValue(index, kkey, ktype, kvalue)
+        if error is not None:
+            result.rejected.append(error)
+            continue
+        if ktype in ("int", "float") and not isinstance(kvalue, SettingFunction):
+            minimum, maximum = facts.limits.get((extrud, kkey), (math.nan, math.nan))
+            # Comparisons with NaN (no limit) are always False
+            if kvalue < minimum or kvalue > maximum:
+                result.rejected.append("%s : %s is out of range [%s, %s]" % (kkey, kvalue, minimum, maximum))
+                continue
+        if not facts.enabled.get((extrud, kkey), True):
+            result.disabled.append(kkey)
+        result.applicable += 1
+    return result
+
+
+def analyseFleet(profiles: List[Tuple[str, ProfileTable]], machines: List[Any], resolver: QualityResolver) -> List[PairResult]:
+    """The compatibility of every profile with every printer.
+
+    The properties of the printers are evaluated first on the main thread (the stacks are not
+    thread safe and are never modified), then the profile / printer pairs are compared in
+    parallel on plain data.
+    """
+    keys = set()  # type: Set[Tuple[int, str]]
+    quality_types = set()  # type: Set[str]
+    for profile_name, table in profiles:
+        keys.update((row.extruder, row.key) for row in table.rows)
+        if table.getGeneral("Quality_Type"):
+            quality_types.add(table.getGeneral("Quality_Type"))
+    facts = [readMachineFacts(machine, keys, quality_types, resolver) for machine in machines]
+
+    pairs = [(profile_name, table, machine_facts) for profile_name, table in profiles for machine_facts in facts]
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(lambda pair: comparePair(*pair), pairs))
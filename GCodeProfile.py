@@ -0,0 +1,58 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import json
+import mmap
+import os
+import re
+
+from typing import List
+
+# Cura writes the profile at the end of the g-code as ;SETTING_3 comment lines
+_SETTING_PREFIX = b";SETTING_3 "
+
+# Characters escaped by the GCodeWriter in the comments
+_ESCAPE_CHARACTERS = {
+    "\\\\": "\\",
+    "\\n": "\n",
+    "\\r": "\r"
+}
+_ESCAPE_PATTERN = re.compile(r"\\\\|\\n|\\r")
+
+
+def readGCodeProfile(file_name: str) -> List[str]:
+    """Read the serialized profiles stored in the settings trailer of a g-code file.
+
+    The file is memory-mapped and searched from the end, so only the trailer is read
+    whatever the size of the g-code.
+
+    :param file_name: The full path of the g-code file.
+    :return: The serialized global profile followed by the extruder profiles, empty if
+        the file doesn't contain any profile.
+    """
+    if os.path.getsize(file_name) == 0:
+        return []
+
+    with open(file_name, "rb") as gcode_file:
+        with mmap.mmap(gcode_file.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            start = data.rfind(_SETTING_PREFIX)
+            if start < 0:
+                return []
+            # Walk back line by line to the first line of the trailer
+            while start > 0:
+                line_start = data.rfind(b"\n", 0, start - 1) + 1
+                if data[line_start:line_start + len(_SETTING_PREFIX)] != _SETTING_PREFIX:
+                    break
+                start = line_start
+            trailer = data[start:].decode("utf-8")
+
+    prefix = _SETTING_PREFIX.decode("utf-8")
+    serialized = "".join(line[len(prefix):].rstrip("\r") for line in trailer.split("\n") if line.startswith(prefix))
+    serialized = _ESCAPE_PATTERN.sub(lambda match: _ESCAPE_CHARACTERS[match.group(0)], serialized).strip()
+    if not serialized:
+        return []
+
+    json_data = json.loads(serialized)
+    profile_strings = [json_data["global_quality"]]
+    profile_strings.extend(json_data.get("extruder_quality", []))
+    return profile_strings
@@ -17,6 +17,31 @@
 # Version 1.2.4 : Change i18n location
 #
 # Version 1.3.0 : Export also Setting Label & add import by step
+# Version 1.3.1 : Lazy & cached translation of the setting labels
+# Version 1.3.2 : CSV merge applied as a transaction & Undo Last Merge
+# Version 1.3.3 : Merge a CSV File into several printers
+# Version 1.3.4 : Validation of the values before the merge
+# Version 1.3.5 : Export & import of the formulas
+# Version 1.3.6 : Import the profile of a G-Code file from its settings trailer
+# Version 1.3.7 : Import the profile of a 3MF project
+# Version 1.3.8 : Native Cura Profile reader / writer & merge of Cura files
+# Version 1.3.9 : Profile library (SQLite) with search & load
+# Version 1.3.10 : Watch a folder and merge the new or modified files
+# Version 1.3.11 : Merge layered files in one pass
+# Version 1.3.12 : Substitute a missing quality by the closest layer height
+# Version 1.3.13 : Shared profile model for the readers / writers
+# Version 1.3.14 : Migration of the settings renamed or removed since the Cura version of a CSV file
+# Version 1.3.15 : Export of the settings selected by sections & key patterns
+# Version 1.3.16 : Export an archive in several formats at once
+# Version 1.3.17 : Export & import of the per object settings
+# Version 1.3.18 : Snapshot history of the profile & restore
+# Version 1.3.19 : Local HTTP / JSON server for the export, diff & import
+# Version 1.3.20 : Transformation rules applied to the merged files
+# Version 1.3.21 : Compatibility report of several profiles with several printers
+# Version 1.3.22 : Export of the overrides with their container & import in the same container
+# Version 1.3.23 : Remove the overrides of the custom profile without effect
+# Version 1.3.24 : Merge directly in the custom profile or in a new custom profile
+# Version 1.3.25 : Service for the other plugins & the scripts, used by the profile server
 #-------------------------------------------------------------------------------------------
 
 
@@ -26,11 +51,13 @@ try:
     from PyQt6.QtCore import QTimer
     from PyQt6.QtCore import pyqtSlot
     from PyQt6.QtWidgets import QFileDialog, QMessageBox
+    from PyQt6.QtWidgets import QAbstractItemView, QDialog, QDialogButtonBox, QInputDialog, QListWidget, QVBoxLayout
 except ImportError:
     from PyQt5.QtCore import QObject
     from PyQt5.QtCore import QTimer
     from PyQt5.QtCore import pyqtSlot
     from PyQt5.QtWidgets import QFileDialog, QMessageBox
+    from PyQt5.QtWidgets import QAbstractItemView, QDialog, QDialogButtonBox, QInputDialog, QListWidget, QVBoxLayout
     VERSION_QT5 = True
     
     
@@ -40,9 +67,14 @@ import os.path
 import sys
 import re
 import time
+import hashlib
+import io
+import json
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
-from typing import cast, Dict, List, Optional, Tuple, Any, Set
+from typing import cast, Callable, Dict, List, Optional, Tuple, Any, Set
 from cura.CuraApplication import CuraApplication
 from cura.Settings.cura_empty_instance_containers import empty_quality_container
 from cura.Machines.ContainerTree import ContainerTree
@@ -75,12 +107,38 @@ from UM.PluginRegistry import PluginRegistry  # For getting the possible profile
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.Settings.Interfaces import ContainerInterface, ContainerRegistryInterface
 from UM.Settings.InstanceContainer import InstanceContainer
+from UM.Settings.SettingFunction import SettingFunction
+from UM.Settings.SettingInstance import SettingInstance
 from UM.Util import parseBool
 
+from .CuraProfileCodec import parseProfile, readCuraProfile, writeCuraProfile
+from .FleetMatrix import analyseFleet
+from .GCodeProfile import readGCodeProfile
+from .ObjectSettings import ObjectSettings, applyObjectSettings, collectObjectSettings, matchObjects
+from .OverridePruning import findAllRedundantOverrides
+from .ProfileLibrary import ProfileLibrary
+from .ProfileModel import ProfileTable, SettingRow
+from .ProfileServer import ProfileServer
+from .ProfileService import ProfileService
+from .ProfileTransaction import ProfileTransaction
+from .ProjectProfile import readProjectProfile
+from .QualityResolver import QualityResolver
+from .SettingMigration import migrationMap, parseVersion
+from .SettingSelector import SettingSelector
+from .SettingValidation import SettingIndex, validateChanges
+from .SnapshotStore import SnapshotStore
+from .TransformRules import TransformRules
+
 i18n_cura_catalog = i18nCatalog("cura")
 i18n_catalog = i18nCatalog("fdmprinter.def.json")
 i18n_extrud_catalog = i18nCatalog("fdmextruder.def.json")
 
+# Translation lookups are shared between the CSV import and export
+# Key : (catalog, context, text)
+@lru_cache(maxsize = 4096)
+def _cachedTranslation(translation_catalog: i18nCatalog, context: str, text: str) -> str:
+    return translation_catalog.i18nc(context, text)
+
 
 Resources.addSearchPath(
 	os.path.join(os.path.abspath(os.path.dirname(__file__)),'resources')
@@ -88,6 +146,9 @@ Resources.addSearchPath(
 
 catalog = i18nCatalog("profiles")
 
+# Snapshots kept in the history
+_SNAPSHOT_COUNT = 500
+
 if catalog.hasTranslationLoaded():
 	Logger.log("i", "Import Export Profiles Plugin translation loaded!")
 
@@ -101,10 +162,44 @@ class ImportExportProfiles(Extension, QObject,):
         self._application = Application.getInstance()
         self._preferences = self._application.getPreferences()
         self._preferences.addPreference("import_export_tools/dialog_path", "")
+        self._preferences.addPreference("import_export_tools/watch_folder", "")
+        self._preferences.addPreference("import_export_tools/export_patterns", "speed_*, material")
+        self._preferences.addPreference("import_export_tools/server_enabled", False)
+        self._preferences.addPreference("import_export_tools/server_port", 8765)
+        self._preferences.addPreference("import_export_tools/transform_rules", "")
+        # user, quality_changes or new_quality_changes
+        self._preferences.addPreference("import_export_tools/import_target", "user")
         self._change_dialog = None
+        # Polling of the watched folder
         self._update_timer = QTimer()
-        self._update_timer.setInterval(0)
-        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(2000)
+        self._update_timer.setSingleShot(False)
+        self._update_timer.timeout.connect(self._pollWatchFolder)
+        # Watched file -> (mtime, size, content hash, applied values)
+        self._watched_files = {}  # type: Dict[str, Tuple[float, int, str, Dict[Tuple[int, str], Any]]]
+        # Modified file waiting for the next poll -> (mtime, size)
+        self._pending_files = {}  # type: Dict[str, Tuple[float, int]]
+        self._last_transaction = None
+        # (transaction, targets, previous targets) of the last CSV import, its undo removes a new custom profile
+        self._last_created_targets = None
+        self._export_formulas = False
+        # (selected keys, keys to visit) of the selective export, None to export everything
+        self._export_selection = None
+        self._library = None
+        self._snapshots = None
+        self._server = None
+        self._application.applicationShuttingDown.connect(self._stopProfileServer)
+        self._service = ProfileService(self)
+        # (text, compiled rules) of the transform_rules preference
+        self._transform_rules = ("", TransformRules(""))
+        self._quality_resolver = QualityResolver()
+        self._baseline = set()  # type: Set[str]
+        # File extension -> writer(file_name, settings, serialized profiles) of the archive export
+        self._export_sinks = {
+            "csv": self._writeCsvFile,
+            "curaprofile": self._writeProfileFile,
+            "json": self._writeJsonFile
+        }  # type: Dict[str, Callable[[str, ProfileTable, List[Tuple[str, str]]], None]]
         
         self.Major=1
         self.Minor=0
@@ -139,12 +234,43 @@ class ImportExportProfiles(Extension, QObject,):
 
         self.setMenuName(catalog.i18nc("@item:inmenu", "Import/Export Settings"))
         self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Current Settings"), self.exportData)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Current Settings with Formulas"), self.exportDataFormulas)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Selected Settings"), self.exportDataSelected)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Overrides with their Source"), self.exportDataProvenance)
         self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Current Profile"), self.exportProfile)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Export an Archive (all formats)"), self.exportArchive)
         self.addMenuItem("", lambda: None)
         self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge a CSV File"), self.importDataDirect)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge a CSV File into several Printers"), self.importDataMachines)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Compatibility Report of Files with Printers"), self.fleetReport)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge Layered Files"), self.importLayers)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge Rules"), self.editTransformRules)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge Target"), self.selectImportTarget)
         self.addMenuItem(catalog.i18nc("@item:inmenu", "Import Cura Profile"), self.importProfile)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Export Per Object Settings"), self.exportObjectSettings)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Import Per Object Settings"), self.importObjectSettings)
         self.addMenuItem(" ", lambda: None)
         self.addMenuItem(catalog.i18nc("@item:inmenu", "Merge by Step a CSV File"), self.importDataByStep)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Undo Last Merge"), self.undoLastImport)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Restore a Snapshot"), self.restoreSnapshot)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Clean the Custom Profile"), self.pruneRedundantOverrides)
+        self.addMenuItem("  ", lambda: None)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Profile Library : Add a Folder"), self.ingestLibraryFolder)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Profile Library : Search"), self.searchLibrary)
+        self.addMenuItem("   ", lambda: None)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Watch a Folder"), self.watchFolder)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Stop Watching"), self.stopWatchFolder)
+        self.addMenuItem("    ", lambda: None)
+        self.addMenuItem(catalog.i18nc("@item:inmenu", "Profile Server : Start / Stop"), self.toggleProfileServer)
+
+        if os.path.isdir(self._preferences.getValue("import_export_tools/watch_folder")) :
+            self._startWatchFolder()
+        if parseBool(self._preferences.getValue("import_export_tools/server_enabled")) :
+            self._startProfileServer()
+
+    # Export, diff & import in memory for the other plugins and the scripts
+    def getService(self) -> ProfileService:
+        return self._service
 
     # Return Actual ProfileName
     def profileName(self)->str:
@@ -166,20 +292,7 @@ class ImportExportProfiles(Extension, QObject,):
         
         #container_list = [cast(InstanceContainer, _containerRegistry.findContainers(id = quality_changes_group.metadata_for_global["id"])[0])]  # type: List[InstanceContainer]
         #for metadata in quality_changes_group.metadata_per_extruder.values():
-        container_list = [] 
-        for extruder_stack in CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks():
-            for container in extruder_stack.getContainers():
-                if str(container.getMetaDataEntry("type")) == "quality_changes" :
-                    if container.getName() != "empty" :
-                        container_list.append(cast(InstanceContainer, container))
-                    else :
-                        Logger.log("d", "Container empty : {}".format(container) )
-                    
-        Cstack = CuraApplication.getInstance().getGlobalContainerStack()
-        for container in Cstack.getContainers():
-            if str(container.getMetaDataEntry("type")) == "quality_changes" :
-                if container.getName() != "empty" :
-                    container_list.append(cast(InstanceContainer, container))
+        container_list = self._qualityChangesContainers()
         
         if len(container_list) :
             file_name = ""
@@ -208,15 +321,131 @@ class ImportExportProfiles(Extension, QObject,):
                 Logger.log("d", "No file to export selected")
                 return
                 
-            _containerRegistry.exportQualityProfile(container_list, file_name, catalog.i18nc("@filter", "Cura Profile (*.curaprofile)"))
+            try:
+                writeCuraProfile(file_name, [(container.getId(), container.serialize()) for container in container_list])
+            except:
+                Logger.logException("e", "Could not export profile to the selected file")
+                return
             self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
+            self._addFileToLibrary(file_name)
+            self._takeSnapshot("Export " + os.path.basename(file_name))
+            Message().hide()
+            Message(catalog.i18nc("@text", "Exported profile %s") % value, title = catalog.i18nc("@title", "Export Profiles Tools")).show()
             
         else:
             Message().hide()
             Message(catalog.i18nc("@text", "Nothing to export !"), title = catalog.i18nc("@title", "Export Profiles Tools")).show()            
     
+    # The quality_changes containers of the active printer (extruders then global)
+    def _qualityChangesContainers(self) -> List[InstanceContainer]:
+        container_list = [] 
+        for extruder_stack in CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks():
+            for container in extruder_stack.getContainers():
+                if str(container.getMetaDataEntry("type")) == "quality_changes" :
+                    if container.getName() != "empty" :
+                        container_list.append(cast(InstanceContainer, container))
+                    else :
+                        Logger.log("d", "Container empty : {}".format(container) )
+                    
+        Cstack = CuraApplication.getInstance().getGlobalContainerStack()
+        for container in Cstack.getContainers():
+            if str(container.getMetaDataEntry("type")) == "quality_changes" :
+                if container.getName() != "empty" :
+                    container_list.append(cast(InstanceContainer, container))
+        return container_list
+
+    # The current settings and the serialized custom profile of the active printer
+    def _collectExport(self) -> Tuple[ProfileTable, List[Tuple[str, str]]]:
+        table = self._collectSettings()
+        profiles = [(container.getId(), container.serialize()) for container in self._qualityChangesContainers()]
+        return table, profiles
+
+    # Add a format to the archive export
+    # The writer is called from a worker thread : it must only use the settings & profiles it receives
+    def registerExportSink(self, extension: str, writer: Callable[[str, ProfileTable, List[Tuple[str, str]]], None]) -> None:
+        self._export_sinks[extension.lower().lstrip(".")] = writer
+
+    # Export the current settings & profile in every format in one step
+    def exportArchive(self) -> None:
+        folder = QFileDialog.getExistingDirectory(None, catalog.i18nc("@title:window", "Select a folder"), self._preferences.getValue("import_export_tools/dialog_path"))
+        if not folder:
+            return
+        self._preferences.setValue("import_export_tools/dialog_path", folder)
+
+        # The stacks are read once, on the main thread
+        try:
+            table, profiles = self._collectExport()
+        except:
+            Logger.logException("e", "Could not read the current settings")
+            return
+
+        base_name = os.path.join(folder, self.profileName() or table.getGeneral("Quality_Type") or "profile")
+        # Only file writing is done in the threads
+        with ThreadPoolExecutor(max_workers = len(self._export_sinks)) as executor:
+            futures = {extension: executor.submit(writer, base_name + "." + extension, table, profiles) for extension, writer in self._export_sinks.items()}
+        written = []  # type: List[str]
+        failed = []  # type: List[str]
+        for extension, future in futures.items():
+            error = future.exception()
+            if error is None :
+                written.append(base_name + "." + extension)
+            else :
+                Logger.log("e", "Could not export the %s file : %s", extension, error)
+                failed.append(extension)
+
+        for file_name in written:
+            if file_name.endswith((".csv", ".curaprofile")) :
+                self._addFileToLibrary(file_name)
+        self._takeSnapshot("Export " + os.path.basename(base_name))
+
+        text = catalog.i18nc("@text", "Exported files :") + "\n" + "\n".join(os.path.basename(file_name) for file_name in written)
+        if failed :
+            text += "\n" + catalog.i18nc("@text", "Not exported : %s") % ", ".join(failed)
+        Message().hide()
+        Message(text, title = catalog.i18nc("@title", "Export Profiles Tools")).show()
+
+    def _writeCsvFile(self, file_name: str, table: ProfileTable, profiles: List[Tuple[str, str]]) -> None:
+        with open(file_name, 'w', newline='') as csv_file:
+            # csv.QUOTE_MINIMAL  or csv.QUOTE_NONNUMERIC ?
+            csv_writer = csv.writer(csv_file, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            # E_dialect = csv.get_dialect("excel")
+            # csv_writer = csv.writer(csv_file, dialect=E_dialect)
+            self._writeCsvTable(csv_writer, table)
+
+    def _writeProfileFile(self, file_name: str, table: ProfileTable, profiles: List[Tuple[str, str]]) -> None:
+        if not profiles :
+            raise ValueError("No custom profile")
+        writeCuraProfile(file_name, profiles)
+
+    def _writeJsonFile(self, file_name: str, table: ProfileTable, profiles: List[Tuple[str, str]]) -> None:
+        with open(file_name, "w", encoding = "utf-8") as json_file:
+            json.dump(table.toDict(), json_file, indent = 1)
+
     # Export CSV File    
-    def exportData(self) -> None:
+    def exportDataFormulas(self) -> None:
+        self.exportData(True)
+
+    # Export only the sections & keys matching patterns like : speed_*, material, machine_settings
+    def exportDataSelected(self) -> None:
+        patterns, ok = QInputDialog.getText(None, catalog.i18nc("@title:window", "Export Selected Settings"),
+                                            catalog.i18nc("@label", "Sections or keys (speed_*, material, re:^support_.*) :"),
+                                            text = self._preferences.getValue("import_export_tools/export_patterns"))
+        if not ok or not patterns.strip():
+            return
+        try:
+            selector = SettingSelector(patterns)
+        except (ValueError, re.error) as e:
+            Message().hide()
+            Message(catalog.i18nc("@text", "Invalid pattern : %s") % str(e), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+        self._preferences.setValue("import_export_tools/export_patterns", patterns)
+        self.exportData(False, selector)
+
+    # Export only the values defined by the containers above the definition, with their container
+    def exportDataProvenance(self) -> None:
+        self.exportData(provenance = True)
+
+    def exportData(self, formulas: bool = False, selector: Optional[SettingSelector] = None, provenance: bool = False) -> None:
         # Thanks to Aldo Hoeben / fieldOfView for this part of the code
         file_name = ""
         tempo_file_name = self.profileName() + ".csv"
@@ -248,115 +477,194 @@ class ImportExportProfiles(Extension, QObject,):
         self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
         # -----
         
+        try:
+            table = self._collectProvenance() if provenance else self._collectSettings(formulas, selector)
+            self._writeCsvFile(file_name, table, [])
+        except:
+            Logger.logException("e", "Could not export profile to the selected file")
+            return
+
+        P_Name = table.getGeneral("Profile")
+        self._addFileToLibrary(file_name)
+        self._takeSnapshot("Export " + os.path.basename(file_name))
+        Message().hide()
+        Message(catalog.i18nc("@text", "Exported data for profile %s") % P_Name, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Read the current settings of the active machine
+    def _collectSettings(self, formulas: bool = False, selector: Optional[SettingSelector] = None) -> ProfileTable:
         machine_manager = CuraApplication.getInstance().getMachineManager()        
         stack = CuraApplication.getInstance().getGlobalContainerStack()
 
         global_stack = machine_manager.activeMachine
+        self._export_formulas = formulas
+        self._export_selection = selector.select(stack.definition) if selector is not None else None
 
         # Get extruder count
         extruder_count=stack.getProperty("machine_extruder_count", "value")
-        
-        # for name in sorted(csv.list_dialects()):
-        #             Logger.log("d", "Dialect = %s" % name)
-        #             dialect = csv.get_dialect(name)
-        #             Logger.log("d", "Delimiter = %s" % dialect.delimiter)
-        
-        exported_count = 0
-        try:
-            with open(file_name, 'w', newline='') as csv_file:
-                # csv.QUOTE_MINIMAL  or csv.QUOTE_NONNUMERIC ?
-                csv_writer = csv.writer(csv_file, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                # E_dialect = csv.get_dialect("excel")
-                # csv_writer = csv.writer(csv_file, dialect=E_dialect)
-                
-                csv_writer.writerow([
-                    "Section",
-                    "Extruder",
-                    "Key",
-                    "Type",
-                    "Label",
-                    "Value"
-                ])
-                 
-                # Date
-                self._WriteRow(csv_writer,"general",0,"Date","str","Date",datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
-                # Platform
-                self._WriteRow(csv_writer,"general",0,"Os","str","Os",str(platform.system()) + " " + str(platform.version())) 
-                # Version  
-                self._WriteRow(csv_writer,"general",0,"Cura_Version","str","Cura Version",CuraVersion)
-                # Profile
-                P_Name = global_stack.qualityChanges.getMetaData().get("name", "")
-                self._WriteRow(csv_writer,"general",0,"Profile","str","Profile",P_Name)
-                # Quality
-                Q_Name = global_stack.quality.getMetaData().get("name", "")
-                self._WriteRow(csv_writer,"general",0,"Quality","str","Quality",Q_Name)
-                # Extruder_Count
-                self._WriteRow(csv_writer,"general",0,"Extruder_Count","int","Extruder_Count",str(extruder_count))
-                
-                # Material
-                # extruders = list(global_stack.extruders.values())  
-                extruder_stack = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
- 
-                # Define every section to get the same order as in the Cura Interface
-                # Modification from global_stack to extruders[0]
-                i=0
-                for Extrud in extruder_stack:    
-                    i += 1                        
-                    self._doTree(Extrud,"resolution",csv_writer,0,i)
-                    # Shell before 4.9 and now Walls
-                    self._doTree(Extrud,"shell",csv_writer,0,i)
-                    # New section Arachne and 4.9 ?
-                    if self.Major > 4 or ( self.Major == 4 and self.Minor >= 9 ) :
-                        self._doTree(Extrud,"top_bottom",csv_writer,0,i)
-                    self._doTree(Extrud,"infill",csv_writer,0,i)
-                    self._doTree(Extrud,"material",csv_writer,0,i)
-                    self._doTree(Extrud,"speed",csv_writer,0,i)
-                    self._doTree(Extrud,"travel",csv_writer,0,i)
-                    self._doTree(Extrud,"cooling",csv_writer,0,i)
-                    # If single extruder doesn't export the data
-                    if extruder_count>1 :
-                        self._doTree(Extrud,"dual",csv_writer,0,i)
-                        
-                    self._doTree(Extrud,"support",csv_writer,0,i)
-                    self._doTree(Extrud,"platform_adhesion",csv_writer,0,i)                   
-                    self._doTree(Extrud,"meshfix",csv_writer,0,i)             
-                    self._doTree(Extrud,"blackmagic",csv_writer,0,i)
-                    self._doTree(Extrud,"experimental",csv_writer,0,i)
-                    
-                    # Machine_settings
-                    # Not Updated by This Plugin
-                    # self._doTree(Extrud,"machine_settings",csv_writer,0,i)
-                    
-        except:
-            Logger.logException("e", "Could not export profile to the selected file")
-            return
 
-        Message().hide()
-        Message(catalog.i18nc("@text", "Exported data for profile %s") % P_Name, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+        table = ProfileTable()
+        self._addGeneralRows(table, global_stack, extruder_count)
 
-    def _WriteRow(self,csvwriter,Section,Extrud,Key,KType,KeyLbl,ValStr):
-        
-        csvwriter.writerow([
-                     Section,
-                     "%d" % Extrud,
-                     Key,
-                     KType,
-                     KeyLbl,
-                     str(ValStr)
-                ])
+        # Material
+        # extruders = list(global_stack.extruders.values())  
+        extruder_stack = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+
+        # Define every section to get the same order as in the Cura Interface
+        # Modification from global_stack to extruders[0]
+        i=0
+        for Extrud in extruder_stack:    
+            i += 1                        
+            self._doTree(Extrud,"resolution",table,0,i)
+            # Shell before 4.9 and now Walls
+            self._doTree(Extrud,"shell",table,0,i)
+            # New section Arachne and 4.9 ?
+            if self.Major > 4 or ( self.Major == 4 and self.Minor >= 9 ) :
+                self._doTree(Extrud,"top_bottom",table,0,i)
+            self._doTree(Extrud,"infill",table,0,i)
+            self._doTree(Extrud,"material",table,0,i)
+            self._doTree(Extrud,"speed",table,0,i)
+            self._doTree(Extrud,"travel",table,0,i)
+            self._doTree(Extrud,"cooling",table,0,i)
+            # If single extruder doesn't export the data
+            if extruder_count>1 :
+                self._doTree(Extrud,"dual",table,0,i)
+                
+            self._doTree(Extrud,"support",table,0,i)
+            self._doTree(Extrud,"platform_adhesion",table,0,i)                   
+            self._doTree(Extrud,"meshfix",table,0,i)             
+            self._doTree(Extrud,"blackmagic",table,0,i)
+            self._doTree(Extrud,"experimental",table,0,i)
+            
+            # Machine_settings
+            # Not Updated by This Plugin, only exported when explicitly selected
+            if selector is not None :
+                self._doTree(Extrud,"machine_settings",table,0,i)
+        return table
+
+    # Read only the values of the containers above the definitions, tagged with their container
+    # The top-most value of each stack is kept : global:user, extruder:quality_changes ...
+    def _collectProvenance(self) -> ProfileTable:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        extruder_count=global_stack.getProperty("machine_extruder_count", "value")
+        index = SettingIndex.forStack(global_stack)
+        table = ProfileTable()
+        self._addGeneralRows(table, global_stack, extruder_count)
+
+        # The global values are written once, with the first extruder
+        stacks = [("global", 0, global_stack)]
+        stacks += [("extruder", position, extruder) for position, extruder in enumerate(CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks())]
+        for scope, position, stack in stacks:
+            seen = set()  # type: Set[str]
+            # Without the definition at the bottom of the stack
+            for container in stack.getContainers()[:-1]:
+                source = "%s:%s" % (scope, container.getMetaDataEntry("type"))
+                for key in sorted(container.getAllKeys()):
+                    if key in seen :
+                        continue
+                    seen.add(key)
+                    ktype = index.getType(key) or "str"
+                    value = container.getProperty(key, "value")
+                    if isinstance(value, SettingFunction) :
+                        value_string = str(value)
+                    elif ktype == "float" :
+                        try:
+                            value_string = "{:.4f}".format(float(value)).rstrip("0").rstrip(".")
+                        except (TypeError, ValueError):
+                            value_string = str(value)
+                    else :
+                        value_string = str(value)
+                    label = index.getLabel(key) or key
+                    table.append(SettingRow(index.getCategory(key) or "", position, key, ktype, label, value_string, source))
+        return table
+
+    # The general informations written at the beginning of an export
+    def _addGeneralRows(self, table: ProfileTable, global_stack, extruder_count: int) -> None:
+        # Date
+        table.addGeneral("Date", datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+        # Platform
+        table.addGeneral("Os", str(platform.system()) + " " + str(platform.version()))
+        # Version  
+        table.addGeneral("Cura_Version", CuraVersion, label = "Cura Version")
+        # Profile
+        table.addGeneral("Profile", global_stack.qualityChanges.getMetaData().get("name", ""))
+        # Quality
+        table.addGeneral("Quality", global_stack.quality.getMetaData().get("name", ""))
+        table.addGeneral("Quality_Type", global_stack.quality.getMetaDataEntry("quality_type", ""), label = "Quality Type")
+        # Machine
+        table.addGeneral("Machine", global_stack.getName())
+        # Extruder_Count
+        table.addGeneral("Extruder_Count", str(extruder_count), "int")
+
+    def _writeCsvTable(self, csvwriter, table: ProfileTable) -> None:
+        # Source column only for the export with the containers of the values
+        provenance = any(row.source for row in table.rows)
+        header = [
+            "Section",
+            "Extruder",
+            "Key",
+            "Type",
+            "Label",
+            "Value"
+        ]
+        if provenance :
+            header.append("Source")
+        csvwriter.writerow(header)
+        # The same list is reused for every row of the table
+        # One list per table : several tables can be written at the same time by the server threads
+        buffer = [""] * len(header)
+        for row in table.general:
+            self._WriteRow(csvwriter,buffer,row.section,0,row.key,row.type,row.label,row.value)
+        for row in table.rows:
+            if provenance :
+                buffer[6] = row.source
+            self._WriteRow(csvwriter,buffer,row.section,row.extruder + 1,row.key,row.type,row.label,row.value)
+
+    def _WriteRow(self,csvwriter,buffer,Section,Extrud,Key,KType,KeyLbl,ValStr):
+        buffer[0] = Section
+        buffer[1] = "%d" % Extrud
+        buffer[2] = Key
+        buffer[3] = KType
+        buffer[4] = KeyLbl
+        buffer[5] = str(ValStr)
+        csvwriter.writerow(buffer)
                
-    def _doTree(self,stack,key,csvwriter,depth,extrud):   
+    # Translated label of a setting, only resolved when it is really displayed
+    # The files keep the label of the definition : the same profile gives the same file in every language
+    def _translateLabel(self, key: str, label: str) -> str:
+        return _cachedTranslation(i18n_catalog, key + " label", label)
+
+    # True if the raw value of a setting is the value of its definition
+    # An extruder stack without the setting in its definition falls back to the definition of the printer
+    def _isDefinitionValue(self, stack, key: str) -> bool:
+        definition_stack = stack
+        while definition_stack is not None and definition_stack.definition.getProperty(key, "value") is None :
+            definition_stack = definition_stack.getNextStack()
+        if definition_stack is None :
+            return False
+        return str(stack.getRawProperty(key, "value")) == str(definition_stack.definition.getProperty(key, "value"))
+
+    def _doTree(self,stack,key,table,depth,extrud):   
+        # Selective export : skip the subtrees without any selected key
+        selection = self._export_selection
+        if selection is not None and key not in selection[1] :
+            return
         #output node     
         Pos=0
         if stack.getProperty(key,"type") == "category":
             self._Section=key
         else:
-            if stack.getProperty(key,"enabled") == True:
+            # Export with formulas : only the values changed from the definition, the file keeps the changes
+            if (selection is None or key in selection[0]) and stack.getProperty(key,"enabled") == True and not (self._export_formulas and self._isDefinitionValue(stack, key)):
                 GetType=stack.getProperty(key,"type")
                 GetVal=stack.getProperty(key,"value")
                 GetKeyLabl=stack.getProperty(key,"label")
+                # Raw value of the top-most container defining the setting
+                GetRaw=stack.getRawProperty(key,"value") if self._export_formulas else None
                 
-                if str(GetType)=='float':
+                if isinstance(GetRaw, SettingFunction):
+                    # Formula exported as =expression
+                    GelValStr=str(GetRaw)
+                elif str(GetType)=='float':
                     # GelValStr="{:.2f}".format(GetVal).replace(".00", "")  # Formatage
                     GelValStr="{:.4f}".format(GetVal).rstrip("0").rstrip(".") # Formatage
                 else:
@@ -370,13 +678,13 @@ class ImportExportProfiles(Extension, QObject,):
                     else:
                         GelValStr=str(GetVal)
                 
-                self._WriteRow(csvwriter,self._Section,extrud,key,str(GetType),str(GetKeyLabl),GelValStr)
+                table.append(SettingRow(self._Section,extrud - 1,key,str(GetType),str(GetKeyLabl),GelValStr))
                 depth += 1
 
         #look for children
         if len(CuraApplication.getInstance().getGlobalContainerStack().getSettingDefinition(key).children) > 0:
             for i in CuraApplication.getInstance().getGlobalContainerStack().getSettingDefinition(key).children:       
-                self._doTree(stack,i.key,csvwriter,depth,extrud)       
+                self._doTree(stack,i.key,table,depth,extrud)       
  
     def importProfile(self) -> None:
         # 
@@ -386,14 +694,14 @@ class ImportExportProfiles(Extension, QObject,):
                 parent = None,
                 caption = catalog.i18nc("@title:window", "Open File"),
                 directory = self._preferences.getValue("import_export_tools/dialog_path"),
-                filter = catalog.i18nc("@filter", "Cura Profile (*.curaprofile)"),
+                filter = catalog.i18nc("@filter", "Cura Profile (*.curaprofile)") + ";;" + catalog.i18nc("@filter", "G-Code File (*.gcode)") + ";;" + catalog.i18nc("@filter", "3MF Project (*.3mf)"),
                 options = self._dialog_options
             )[0]
         else:
             dialog = QFileDialog()
             dialog.setWindowTitle(catalog.i18nc("@title:window", "Open File"))
             dialog.setDirectory(self._preferences.getValue("import_export_tools/dialog_path"))
-            dialog.setNameFilters([catalog.i18nc("@filter", "Cura Profile (*.curaprofile)"),catalog.i18nc("@filter", "G-Code File (*.gcode)")])
+            dialog.setNameFilters([catalog.i18nc("@filter", "Cura Profile (*.curaprofile)"),catalog.i18nc("@filter", "G-Code File (*.gcode)"),catalog.i18nc("@filter", "3MF Project (*.3mf)")])
             dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptOpen)
             dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
             if dialog.exec():
@@ -441,13 +749,25 @@ class ImportExportProfiles(Extension, QObject,):
         global_stack = CuraApplication.getInstance().getGlobalContainerStack()
         if not global_stack:
             return {"status": "error", "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "Can't import profile from <filename>{0}</filename> before a printer is added.", file_name)}
-        container_tree = ContainerTree.getInstance()
-
-        machine_extruders = global_stack.extruderList
 
+        self._takeSnapshot("Import " + os.path.basename(file_name))
         plugin_registry = PluginRegistry.getInstance()
         extension = file_name.split(".")[-1]
 
+        # Profiles read directly in the file, without the reader plugins
+        # G-code : only the settings trailer at the end of the file is read
+        # 3MF : only the stacks and profiles members of the project are read
+        direct_readers = {"gcode": readGCodeProfile, "3mf": readProjectProfile}
+        if extension in direct_readers:
+            try:
+                serialized_profiles = direct_readers[extension](file_name)
+            except Exception as e:
+                Logger.log("e", "Failed to import profile from %s: %s", file_name, str(e))
+                return { "status": "error", "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "Failed to import profile from <filename>{0}</filename>:", file_name) + "\n<message>" + str(e) + "</message>"}
+            if not serialized_profiles:
+                return { "status": "ok", "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "No custom profile to import in file <filename>{0}</filename>", file_name)}
+            return self._importProfileList(file_name, self._deserializeProfiles(serialized_profiles, file_name))
+
         for plugin_id, meta_data in self._getIOPlugins("profile_reader"):
             if meta_data["profile_reader"][0]["extension"] != extension:
                 continue
@@ -462,175 +782,7 @@ class ImportExportProfiles(Extension, QObject,):
                 return { "status": "error", "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "Failed to import profile from <filename>{0}</filename>:", file_name) + "\n<message>" + str(e) + "</message>"}
 
             if profile_or_list:
-                # Ensure it is always a list of profiles
-                if not isinstance(profile_or_list, list):
-                    profile_or_list = [profile_or_list]
-
-                # First check if this profile is suitable for this machine
-                global_profile = None
-                extruder_profiles = []
-                if len(profile_or_list) == 1:
-                    global_profile = profile_or_list[0]
-                else:
-                    for profile in profile_or_list:
-                        if not profile.getMetaDataEntry("position"):
-                            global_profile = profile
-                        else:
-                            extruder_profiles.append(profile)
-                extruder_profiles = sorted(extruder_profiles, key = lambda x: int(x.getMetaDataEntry("position", default = "0")))
-                profile_or_list = [global_profile] + extruder_profiles
-
-                if not global_profile:
-                    Logger.log("e", "Incorrect profile [%s]. Could not find global profile", file_name)
-                    return { "status": "error",
-                             "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "This profile <filename>{0}</filename> contains incorrect data, could not import it.", file_name)}
-                profile_definition = global_profile.getMetaDataEntry("definition")
-
-                # Make sure we have a profile_definition in the file:
-                if profile_definition is None:
-                    break
-                
-                # Logger.log("d", "Profile_definition {}".format(profile_definition))
-                _containerRegistry = CuraApplication.getInstance().getContainerRegistry() #ContainerRegistry()  # type: ContainerRegistryInterface
-                machine_definitions = _containerRegistry.findContainers(id = profile_definition)
-                if not machine_definitions:
-                    Logger.log("e", "Incorrect profile [%s]. Unknown machine type [%s]", file_name, profile_definition)
-                    return {"status": "error",
-                            "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "This profile <filename>{0}</filename> contains incorrect data, could not import it.", file_name)
-                            }
-                machine_definition = machine_definitions[0]
-
-                # Get the expected machine definition.
-                # i.e.: We expect gcode for a UM2 Extended to be defined as normal UM2 gcode...
-                has_machine_quality = parseBool(machine_definition.getMetaDataEntry("has_machine_quality", "false"))
-                profile_definition = machine_definition.getMetaDataEntry("quality_definition", machine_definition.getId()) if has_machine_quality else "fdmprinter"
-                expected_machine_definition = container_tree.machines[global_stack.definition.getId()].quality_definition
-
-                # And check if the profile_definition matches either one (showing error if not):
-                if profile_definition != expected_machine_definition:
-                    Logger.log("d", "Profile {file_name} is for machine {profile_definition}, but the current active machine is {expected_machine_definition}. Changing profile's definition.".format(file_name = file_name, profile_definition = profile_definition, expected_machine_definition = expected_machine_definition))
-                    global_profile.setMetaDataEntry("definition", expected_machine_definition)
-                    for extruder_profile in extruder_profiles:
-                        extruder_profile.setMetaDataEntry("definition", expected_machine_definition)
-
-                quality_name = global_profile.getName()
-                quality_type = global_profile.getMetaDataEntry("quality_type")
-
-                name_seed = os.path.splitext(os.path.basename(file_name))[0]
-                new_name = _containerRegistry.uniqueName(name_seed)
-
-                # Ensure it is always a list of profiles
-                if type(profile_or_list) is not list:
-                    profile_or_list = [profile_or_list]
-
-                # Make sure that there are also extruder stacks' quality_changes, not just one for the global stack
-                if len(profile_or_list) == 1:
-                    global_profile = profile_or_list[0]
-                    extruder_profiles = []
-                    for idx, extruder in enumerate(global_stack.extruderList):
-                        profile_id = ContainerRegistry.getInstance().uniqueName(global_stack.getId() + "_extruder_" + str(idx + 1))
-                        profile = InstanceContainer(profile_id)
-                        profile.setName(quality_name)
-                        profile.setMetaDataEntry("setting_version", CuraApplication.SettingVersion)
-                        profile.setMetaDataEntry("type", "quality_changes")
-                        profile.setMetaDataEntry("definition", expected_machine_definition)
-                        profile.setMetaDataEntry("quality_type", quality_type)
-                        profile.setDirty(True)
-                        if idx == 0:
-                            # Move all per-extruder settings to the first extruder's quality_changes
-                            for qc_setting_key in global_profile.getAllKeys():
-                                settable_per_extruder = global_stack.getProperty(qc_setting_key, "settable_per_extruder")
-                                if settable_per_extruder:
-                                    setting_value = global_profile.getProperty(qc_setting_key, "value")
-
-                                    setting_definition = global_stack.getSettingDefinition(qc_setting_key)
-                                    if setting_definition is not None:
-                                        new_instance = SettingInstance(setting_definition, profile)
-                                        new_instance.setProperty("value", setting_value)
-                                        new_instance.resetState()  # Ensure that the state is not seen as a user state.
-                                        profile.addInstance(new_instance)
-                                        profile.setDirty(True)
-
-                                    global_profile.removeInstance(qc_setting_key, postpone_emit = True)
-                        extruder_profiles.append(profile)
-
-                    for profile in extruder_profiles:
-                        profile_or_list.append(profile)
-
-                # Import all profiles
-                profile_ids_added = []  # type: List[str]
-                additional_message = None
-                for profile_index, profile in enumerate(profile_or_list):
-                    if profile_index == 0:
-                        # This is assumed to be the global profile
-                        profile_id = (cast(ContainerInterface, global_stack.getBottom()).getId() + "_" + name_seed).lower().replace(" ", "_")
-
-                    elif profile_index < len(machine_extruders) + 1:
-                        # This is assumed to be an extruder profile
-                        extruder_id = machine_extruders[profile_index - 1].definition.getId()
-                        extruder_position = str(profile_index - 1)
-                        if not profile.getMetaDataEntry("position"):
-                            profile.setMetaDataEntry("position", extruder_position)
-                        else:
-                            profile.setMetaDataEntry("position", extruder_position)
-                        profile_id = (extruder_id + "_" + name_seed).lower().replace(" ", "_")
-
-                    else:  # More extruders in the imported file than in the machine.
-                        continue  # Delete the additional profiles.
-                    
-                    available_quality_groups_dict = {name: quality_group for name, quality_group in ContainerTree.getInstance().getCurrentQualityGroups().items() if quality_group.is_available}
-                    all_quality_groups_dict = ContainerTree.getInstance().getCurrentQualityGroups()
-                    
-                    quality_type = profile.getMetaDataEntry("quality_type")
-                    quality_message = ''
-                    if quality_type not in available_quality_groups_dict:
-                        
-                        # Logger.log("d", "quality_type {}".format(quality_type))
-                        # Logger.log("d", "available_quality_groups_dict {} / {}".format(available_quality_groups_dict, all_quality_groups_dict))
-                        mode ="standard"
-                        Cstack = CuraApplication.getInstance().getGlobalContainerStack()
-                        for container in Cstack.getContainers():                          
-                            if str(container.getMetaDataEntry("type")) == "quality" :
-                                # Logger.log("d", "Container : {}".format(container.getMetaDataEntry("quality_type")) )
-                                if container.getMetaDataEntry("quality_type") != "empty" :
-                                    mode = container.getMetaDataEntry("quality_type")  
-                                else:
-                                    mode ="standard"
-                        
-                        Logger.log("d", "Profile {file_name} is for quality {quality_type}, changed to {mode}. Changing profile's definition.".format(file_name = file_name, quality_type = quality_type, mode = mode))
-                        profile.setMetaDataEntry("quality_type", mode)
-                    
-                        quality_message = catalog.i18nc("@info:status", "\nWarning: The profile have been switch from the quality '{}' to the Quality '{}'".format(quality_type, mode))
-
-                    # This function return the message 
-                    # catalog.i18nc("@info:status", "Warning: The profile is not visible because its quality type '{0}' is not available for the current configuration. Switch to a material/nozzle combination that can use this quality type.", quality_type)
-                    configuration_successful, message = _containerRegistry._configureProfile(profile, profile_id, new_name, expected_machine_definition)
-                    
-                    if quality_message :
-                        if message == None :
-                            message = quality_message
-                        else :
-                            message += quality_message 
-                    
-                    if configuration_successful:
-                        additional_message = message
-                    else:
-                        # Remove any profiles that were added.
-                        for profile_id in profile_ids_added + [profile.getId()]:
-                            _containerRegistry.removeContainer(profile_id)
-                        if not message:
-                            message = ""
-                        return {"status": "error", "message": i18n_cura_catalog.i18nc(
-                                "@info:status Don't translate the XML tag <filename>!",
-                                "Failed to import profile from <filename>{0}</filename>:",
-                                file_name) + " " + message}
-                    profile_ids_added.append(profile.getId())
-                result_status = "ok"
-                success_message = i18n_cura_catalog.i18nc("@info:status", "Successfully imported profile {0}.", profile_or_list[0].getName())
-                if additional_message:
-                    result_status = "warning"
-                    success_message += additional_message
-                return {"status": result_status, "message": success_message}
+                return self._importProfileList(file_name, profile_or_list)
 
             # This message is throw when the profile reader doesn't find any profile in the file
             return {"status": "error", "message": i18n_cura_catalog.i18nc("@info:status", "File {0} does not contain any valid profile.", file_name)}
@@ -638,6 +790,196 @@ class ImportExportProfiles(Extension, QObject,):
         # If it hasn't returned by now, none of the plugins loaded the profile successfully.
         return {"status": "error", "message": i18n_cura_catalog.i18nc("@info:status", "Profile {0} has an unknown file type or is corrupted.", file_name)}
     
+    # Configure and add the profiles read from a file to the registry
+    def _importProfileList(self, file_name: str, profile_or_list) -> Dict[str, str]:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        container_tree = ContainerTree.getInstance()
+        machine_extruders = global_stack.extruderList
+
+        # Ensure it is always a list of profiles
+        if not isinstance(profile_or_list, list):
+            profile_or_list = [profile_or_list]
+
+        # First check if this profile is suitable for this machine
+        global_profile = None
+        extruder_profiles = []
+        if len(profile_or_list) == 1:
+            global_profile = profile_or_list[0]
+        else:
+            for profile in profile_or_list:
+                if not profile.getMetaDataEntry("position"):
+                    global_profile = profile
+                else:
+                    extruder_profiles.append(profile)
+        extruder_profiles = sorted(extruder_profiles, key = lambda x: int(x.getMetaDataEntry("position", default = "0")))
+        profile_or_list = [global_profile] + extruder_profiles
+
+        if not global_profile:
+            Logger.log("e", "Incorrect profile [%s]. Could not find global profile", file_name)
+            return { "status": "error",
+                     "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "This profile <filename>{0}</filename> contains incorrect data, could not import it.", file_name)}
+        profile_definition = global_profile.getMetaDataEntry("definition")
+
+        # Make sure we have a profile_definition in the file:
+        if profile_definition is None:
+            return {"status": "error", "message": i18n_cura_catalog.i18nc("@info:status", "Profile {0} has an unknown file type or is corrupted.", file_name)}
+
+        # Logger.log("d", "Profile_definition {}".format(profile_definition))
+        _containerRegistry = CuraApplication.getInstance().getContainerRegistry() #ContainerRegistry()  # type: ContainerRegistryInterface
+        machine_definitions = _containerRegistry.findContainers(id = profile_definition)
+        if not machine_definitions:
+            Logger.log("e", "Incorrect profile [%s]. Unknown machine type [%s]", file_name, profile_definition)
+            return {"status": "error",
+                    "message": i18n_cura_catalog.i18nc("@info:status Don't translate the XML tags <filename>!", "This profile <filename>{0}</filename> contains incorrect data, could not import it.", file_name)
+                    }
+        machine_definition = machine_definitions[0]
+
+        # Get the expected machine definition.
+        # i.e.: We expect gcode for a UM2 Extended to be defined as normal UM2 gcode...
+        has_machine_quality = parseBool(machine_definition.getMetaDataEntry("has_machine_quality", "false"))
+        profile_definition = machine_definition.getMetaDataEntry("quality_definition", machine_definition.getId()) if has_machine_quality else "fdmprinter"
+        expected_machine_definition = container_tree.machines[global_stack.definition.getId()].quality_definition
+
+        # And check if the profile_definition matches either one (showing error if not):
+        if profile_definition != expected_machine_definition:
+            Logger.log("d", "Profile {file_name} is for machine {profile_definition}, but the current active machine is {expected_machine_definition}. Changing profile's definition.".format(file_name = file_name, profile_definition = profile_definition, expected_machine_definition = expected_machine_definition))
+            global_profile.setMetaDataEntry("definition", expected_machine_definition)
+            for extruder_profile in extruder_profiles:
+                extruder_profile.setMetaDataEntry("definition", expected_machine_definition)
+
+        quality_name = global_profile.getName()
+        quality_type = global_profile.getMetaDataEntry("quality_type")
+
+        name_seed = os.path.splitext(os.path.basename(file_name))[0]
+        new_name = _containerRegistry.uniqueName(name_seed)
+
+        # Ensure it is always a list of profiles
+        if type(profile_or_list) is not list:
+            profile_or_list = [profile_or_list]
+
+        # Make sure that there are also extruder stacks' quality_changes, not just one for the global stack
+        if len(profile_or_list) == 1:
+            global_profile = profile_or_list[0]
+            extruder_profiles = []
+            for idx, extruder in enumerate(global_stack.extruderList):
+                profile_id = ContainerRegistry.getInstance().uniqueName(global_stack.getId() + "_extruder_" + str(idx + 1))
+                profile = InstanceContainer(profile_id)
+                profile.setName(quality_name)
+                profile.setMetaDataEntry("setting_version", CuraApplication.SettingVersion)
+                profile.setMetaDataEntry("type", "quality_changes")
+                profile.setMetaDataEntry("definition", expected_machine_definition)
+                profile.setMetaDataEntry("quality_type", quality_type)
+                profile.setDirty(True)
+                if idx == 0:
+                    # Move all per-extruder settings to the first extruder's quality_changes
+                    for qc_setting_key in global_profile.getAllKeys():
+                        settable_per_extruder = global_stack.getProperty(qc_setting_key, "settable_per_extruder")
+                        if settable_per_extruder:
+                            setting_value = global_profile.getProperty(qc_setting_key, "value")
+
+                            setting_definition = global_stack.getSettingDefinition(qc_setting_key)
+                            if setting_definition is not None:
+                                new_instance = SettingInstance(setting_definition, profile)
+                                new_instance.setProperty("value", setting_value)
+                                new_instance.resetState()  # Ensure that the state is not seen as a user state.
+                                profile.addInstance(new_instance)
+                                profile.setDirty(True)
+
+                            global_profile.removeInstance(qc_setting_key, postpone_emit = True)
+                extruder_profiles.append(profile)
+
+            for profile in extruder_profiles:
+                profile_or_list.append(profile)
+
+        # Layer height of the profile, used to find the closest available quality
+        try:
+            profile_layer_height = float(global_profile.getProperty("layer_height", "value"))
+        except (TypeError, ValueError):
+            profile_layer_height = None
+
+        # Import all profiles
+        profile_ids_added = []  # type: List[str]
+        additional_message = None
+        for profile_index, profile in enumerate(profile_or_list):
+            if profile_index == 0:
+                # This is assumed to be the global profile
+                profile_id = (cast(ContainerInterface, global_stack.getBottom()).getId() + "_" + name_seed).lower().replace(" ", "_")
+
+            elif profile_index < len(machine_extruders) + 1:
+                # This is assumed to be an extruder profile
+                extruder_id = machine_extruders[profile_index - 1].definition.getId()
+                extruder_position = str(profile_index - 1)
+                if not profile.getMetaDataEntry("position"):
+                    profile.setMetaDataEntry("position", extruder_position)
+                else:
+                    profile.setMetaDataEntry("position", extruder_position)
+                profile_id = (extruder_id + "_" + name_seed).lower().replace(" ", "_")
+
+            else:  # More extruders in the imported file than in the machine.
+                continue  # Delete the additional profiles.
+
+            quality_type = profile.getMetaDataEntry("quality_type")
+            quality_message = ''
+            if not self._quality_resolver.isAvailable(global_stack, quality_type):
+
+                # Closest available quality, by layer height
+                mode = self._quality_resolver.resolve(global_stack, quality_type, profile_layer_height)
+                if mode is None :
+                    mode ="standard"
+                    Cstack = CuraApplication.getInstance().getGlobalContainerStack()
+                    for container in Cstack.getContainers():                          
+                        if str(container.getMetaDataEntry("type")) == "quality" :
+                            # Logger.log("d", "Container : {}".format(container.getMetaDataEntry("quality_type")) )
+                            if container.getMetaDataEntry("quality_type") != "empty" :
+                                mode = container.getMetaDataEntry("quality_type")  
+                            else:
+                                mode ="standard"
+
+                Logger.log("d", "Profile {file_name} is for quality {quality_type}, changed to {mode}. Changing profile's definition.".format(file_name = file_name, quality_type = quality_type, mode = mode))
+                profile.setMetaDataEntry("quality_type", mode)
+
+                quality_message = catalog.i18nc("@info:status", "\nWarning: The profile have been switch from the quality '{}' to the Quality '{}'".format(quality_type, mode))
+
+            # This function return the message 
+            # catalog.i18nc("@info:status", "Warning: The profile is not visible because its quality type '{0}' is not available for the current configuration. Switch to a material/nozzle combination that can use this quality type.", quality_type)
+            configuration_successful, message = _containerRegistry._configureProfile(profile, profile_id, new_name, expected_machine_definition)
+
+            if quality_message :
+                if message == None :
+                    message = quality_message
+                else :
+                    message += quality_message 
+
+            if configuration_successful:
+                additional_message = message
+            else:
+                # Remove any profiles that were added.
+                for profile_id in profile_ids_added + [profile.getId()]:
+                    _containerRegistry.removeContainer(profile_id)
+                if not message:
+                    message = ""
+                return {"status": "error", "message": i18n_cura_catalog.i18nc(
+                        "@info:status Don't translate the XML tag <filename>!",
+                        "Failed to import profile from <filename>{0}</filename>:",
+                        file_name) + " " + message}
+            profile_ids_added.append(profile.getId())
+        result_status = "ok"
+        success_message = i18n_cura_catalog.i18nc("@info:status", "Successfully imported profile {0}.", profile_or_list[0].getName())
+        if additional_message:
+            result_status = "warning"
+            success_message += additional_message
+        return {"status": result_status, "message": success_message}
+
+    # Create the profiles read in a g-code or a project file
+    def _deserializeProfiles(self, serialized_profiles: List[str], file_name: str) -> List[InstanceContainer]:
+        profiles = []
+        for serialized in serialized_profiles:
+            # Empty id, the final id and name are defined by _importProfileList
+            profile = InstanceContainer("")
+            profile.deserialize(serialized, file_name)
+            profiles.append(profile)
+        return profiles
+
     def importDataDirect(self) -> None:
         self.importData(False)
         
@@ -646,6 +988,155 @@ class ImportExportProfiles(Extension, QObject,):
         
     # Import CSV file
     def importData(self, byStep: bool) -> None:
+        file_name = self._getOpenFileName(self._mergeFilters())
+        if not file_name:
+            Logger.log("d", "No file to import from selected")
+            return
+
+        self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
+        # -----
+
+        try:
+            table = self._readMergeFile(file_name)
+        except:
+            Logger.logException("e", "Could not import settings from the selected file")
+            return
+        CPro = table.getGeneral("Profile")
+        Logger.log("d", "Csv Import %s : %d rows ByStep = %s", file_name, len(table), byStep)
+
+        Message().hide()
+        errors, warnings = validateChanges(table.rows, CuraApplication.getInstance().getGlobalContainerStack())
+        if errors :
+            self._showValidationErrors(errors)
+            return
+
+        # Before a new custom profile is created and activated for the merge
+        self._takeSnapshot("Merge " + os.path.basename(file_name))
+        previous_targets = self._qualityChangesTargets()
+        targets = self._prepareImportTargets(CPro or os.path.splitext(os.path.basename(file_name))[0])
+        if targets is None :
+            return
+        # Nothing is changed before the end of the file, an abort leaves the profile untouched
+        transaction = ProfileTransaction()
+        imported_count, aborted = self._applyChanges(table.rows, byStep, transaction, targets)
+
+        if aborted :
+            self._discardImportTargets(targets, previous_targets)
+            Message(catalog.i18nc("@text", "Import aborted : the profile has not been modified"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        if not transaction.commit() :
+            self._discardImportTargets(targets, previous_targets)
+            Message(catalog.i18nc("@text", "Import failed : the profile has been restored"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        if transaction.changedCount() :
+            self._last_transaction = transaction
+            # The custom profile created for this merge is removed by its undo
+            self._last_created_targets = (transaction, targets, previous_targets)
+            self._saveImportTargets(targets)
+        text = catalog.i18nc("@text", "Imported profile : %d changed keys from %s") % (imported_count, CPro)
+        if warnings :
+            text += "\n" + catalog.i18nc("@text", "%d values outside of the recommended range") % len(warnings)
+        if self._layerKeys(table.rows) :
+            text += "\n" + self._layerText(self._layerKeys(table.rows))
+        if table.ignored :
+            text += "\n" + self._ignoredText(table.ignored)
+        Message(text, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Keys exported from the quality, material, variant or definition changes : they are not written
+    def _layerKeys(self, changes) -> List[str]:
+        return sorted({row.key for row in changes if row.source and row.source.partition(":")[2] not in ("user", "quality_changes")})
+
+    def _layerText(self, keys: List[str]) -> str:
+        text = catalog.i18nc("@text", "%d values of the quality, material or definition of the file not written : ") % len(keys)
+        text += ", ".join(keys[:10])
+        if len(keys) > 10 :
+            text += " ..."
+        return text
+
+    def _ignoredText(self, ignored: Set[str]) -> str:
+        '''Report once the keys of a file that don't exist in this version of Cura.'''
+        Logger.log("w", "Keys not imported : %s", sorted(ignored))
+        text = catalog.i18nc("@text", "%d unknown keys not imported : ") % len(ignored)
+        text += ", ".join(sorted(ignored)[:10])
+        if len(ignored) > 10 :
+            text += " ..."
+        return text
+
+    def _showValidationErrors(self, errors: List[str]) -> None:
+        '''Report the invalid rows of a file that has been rejected.'''
+        text = catalog.i18nc("@text", "Invalid file, nothing has been imported :")
+        text += "\n" + "\n".join(errors[:10])
+        if len(errors) > 10 :
+            text += "\n" + catalog.i18nc("@text", "... and %d other errors") % (len(errors) - 10)
+        Message(text, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Merge several files as layers : a value of a file overrides the value of the previous files
+    def importLayers(self) -> None:
+        file_names = self._getOpenFileNames(self._mergeFilters())
+        if not file_names:
+            Logger.log("d", "No file to import from selected")
+            return
+
+        self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_names[0]))
+        # The layers are merged in the order of the file names (ex : 1_shop.csv, 2_material.csv, 3_job.csv)
+        file_names = sorted(file_names, key = lambda name: os.path.basename(name).lower())
+
+        # (extruder, key) -> (layer, change) of the final value
+        final_changes = {}  # type: Dict[Tuple[int, str], Tuple[int, SettingRow]]
+        ignored = set()  # type: Set[str]
+        for layer, file_name in enumerate(file_names):
+            try:
+                table = self._readMergeFile(file_name)
+            except:
+                Logger.logException("e", "Could not import settings from the selected file")
+                Message().hide()
+                Message(catalog.i18nc("@text", "Could not read %s, nothing has been imported") % os.path.basename(file_name), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+                return
+            for row in table:
+                final_changes[(row.extruder, row.key)] = (layer, row)
+            ignored |= table.ignored
+
+        # Keys of the final values, grouped by the layer they come from
+        layer_keys = [[] for file_name in file_names]  # type: List[List[str]]
+        for (extrud, kkey), (layer, row) in sorted(final_changes.items()):
+            layer_keys[layer].append(kkey if extrud == 0 else "%s (%d)" % (kkey, extrud + 1))
+            Logger.log("d", "Layered merge : %s (extruder %d) from %s", kkey, extrud + 1, file_names[layer])
+        details = ""
+        for layer, file_name in enumerate(file_names):
+            keys = layer_keys[layer]
+            details += "\n" + catalog.i18nc("@text", "%s : %d values") % (os.path.basename(file_name), len(keys))
+            if keys :
+                details += "\n    " + ", ".join(keys)
+        details = details.lstrip("\n")
+        if ignored :
+            details += "\n" + self._ignoredText(ignored)
+
+        self._mergeChanges([row for layer, row in final_changes.values()], os.path.basename(file_names[-1]), details)
+
+    def _getOpenFileNames(self, name_filters: List[str]) -> List[str]:
+        file_names = []  # type: List[str]
+        if VERSION_QT5:
+            file_names = QFileDialog.getOpenFileNames(
+                parent = None,
+                caption = catalog.i18nc("@title:window", "Open Files"),
+                directory = self._preferences.getValue("import_export_tools/dialog_path"),
+                filter = ";;".join(name_filters),
+                options = self._dialog_options
+            )[0]
+        else:
+            dialog = QFileDialog()
+            dialog.setWindowTitle(catalog.i18nc("@title:window", "Open Files"))
+            dialog.setDirectory(self._preferences.getValue("import_export_tools/dialog_path"))
+            dialog.setNameFilters(name_filters)
+            dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptOpen)
+            dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
+            if dialog.exec():
+                file_names = dialog.selectedFiles()
+        return file_names
+
+    def _getOpenFileName(self, name_filters: List[str]) -> str:
         # thanks to Aldo Hoeben / fieldOfView for this part of the code
         file_name = ""
         if VERSION_QT5:
@@ -653,204 +1144,1164 @@ class ImportExportProfiles(Extension, QObject,):
                 parent = None,
                 caption = catalog.i18nc("@title:window", "Open File"),
                 directory = self._preferences.getValue("import_export_tools/dialog_path"),
-                filter = catalog.i18nc("@filter", "CSV files (*.csv)"),
+                filter = ";;".join(name_filters),
                 options = self._dialog_options
             )[0]
         else:
             dialog = QFileDialog()
             dialog.setWindowTitle(catalog.i18nc("@title:window", "Open File"))
             dialog.setDirectory(self._preferences.getValue("import_export_tools/dialog_path"))
-            dialog.setNameFilters(["CSV files (*.csv)"])
+            dialog.setNameFilters(name_filters)
             dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptOpen)
             dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
             if dialog.exec():
                 file_name = dialog.selectedFiles()[0]
-                
-                
+        return file_name
+
+    def _getSaveFileName(self, tempo_file_name: str, name_filter: str) -> str:
+        file_name = ""
+        if VERSION_QT5:
+            path = os.path.join(self._preferences.getValue("import_export_tools/dialog_path"), tempo_file_name)
+            file_name = QFileDialog.getSaveFileName(
+                parent = None,
+                caption = catalog.i18nc("@title:window", "Save as"),
+                directory = path,
+                filter = name_filter,
+                options = self._dialog_options
+            )[0]
+        else:
+            dialog = QFileDialog()
+            dialog.setWindowTitle(catalog.i18nc("@title:window", "Save as"))
+            dialog.setDirectory(self._preferences.getValue("import_export_tools/dialog_path"))
+            dialog.setNameFilters([name_filter])
+            dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptSave)
+            dialog.setFileMode(QFileDialog.FileMode.AnyFile)
+            dialog.selectFile(tempo_file_name)
+            if dialog.exec():
+                file_name = dialog.selectedFiles()[0]
+        return file_name
+
+    # Export the settings of the models (per model settings, modifiers, support blockers)
+    def exportObjectSettings(self) -> None:
+        try:
+            objects = collectObjectSettings()
+        except:
+            Logger.logException("e", "Could not read the per object settings")
+            return
+        if not objects :
+            Message().hide()
+            Message(catalog.i18nc("@text", "Nothing to export !"), title = catalog.i18nc("@title", "Export Profiles Tools")).show()
+            return
+
+        file_name = self._getSaveFileName(self.profileName() + "_objects.csv", catalog.i18nc("@filter", "CSV files (*.csv)"))
         if not file_name:
-            Logger.log("d", "No file to import from selected")
+            Logger.log("d", "No file to export selected")
             return
+        self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
+
+        index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        try:
+            with open(file_name, 'w', newline='') as csv_file:
+                csv_writer = csv.writer(csv_file, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                csv_writer.writerow(["Object", "Index", "Extruder", "Key", "Type", "Value"])
+                for object_settings in objects:
+                    extruder = "" if object_settings.extruder is None else "%d" % (int(object_settings.extruder) + 1)
+                    if not object_settings.values :
+                        # Only the extruder of the object
+                        csv_writer.writerow([object_settings.name, object_settings.index, extruder, "", "", ""])
+                    for kkey, kvalue in object_settings.values.items():
+                        csv_writer.writerow([object_settings.name, object_settings.index, extruder, kkey, index.getType(kkey) or "str", str(kvalue)])
+        except:
+            Logger.logException("e", "Could not export the per object settings to the selected file")
+            return
+
+        Message().hide()
+        Message(catalog.i18nc("@text", "Exported settings of %d objects") % len(objects), title = catalog.i18nc("@title", "Export Profiles Tools")).show()
 
+    # Apply a file of per object settings to the objects of the scene, matched by name or index
+    def importObjectSettings(self) -> None:
+        file_name = self._getOpenFileName([catalog.i18nc("@filter", "CSV files (*.csv)")])
+        if not file_name:
+            Logger.log("d", "No file to import from selected")
+            return
         self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
-        # -----
-        
-        machine_manager = CuraApplication.getInstance().getMachineManager()        
-        stack = CuraApplication.getInstance().getGlobalContainerStack()
-        global_stack = machine_manager.activeMachine
 
-        #Get extruder count
-        extruder_count=stack.getProperty("machine_extruder_count", "value")
-        
-        #extruders = list(global_stack.extruders.values())   
-        extruder_stack = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
-        
-        imported_count = 0
-        CPro = ""
+        index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        objects = {}  # type: Dict[Tuple[str, int], ObjectSettings]
+        ignored = set()  # type: Set[str]
         try:
             with open(file_name, 'r', newline='') as csv_file:
                 C_dialect = csv.Sniffer().sniff(csv_file.read(1024))
-                # Reset to begining file position
                 csv_file.seek(0, 0)
-                Logger.log("d", "Csv Import %s : Delimiter = %s Quotechar = %s ByStep = %s", file_name, C_dialect.delimiter, C_dialect.quotechar , byStep)
-                # csv.QUOTE_MINIMAL  or csv.QUOTE_NONNUMERIC ?
-                # csv_reader = csv.reader(csv_file, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
                 csv_reader = csv.reader(csv_file, dialect=C_dialect)
-                line_number = -1
+                next(csv_reader, None)
                 for row in csv_reader:
-                    line_number += 1
-                    if line_number == 0:
-                        if len(row) < 5:
-                            continue         
+                    try:
+                        oname, oindex, extrud, kkey, ktype, kvalue = row[0], int(row[1]), row[2], row[3], row[4], row[5]
+                        extruder = str(int(extrud) - 1) if extrud else None
+                    except (IndexError, ValueError):
+                        Logger.log("e", "Row does not have enough data: %s" % row)
+                        continue
+                    object_settings = objects.get((oname, oindex))
+                    if object_settings is None :
+                        object_settings = ObjectSettings(oname, oindex, extruder)
+                        objects[(oname, oindex)] = object_settings
+                    if not kkey :
+                        continue
+                    if not index.hasKey(kkey) :
+                        ignored.add(kkey)
+                        continue
+                    try:
+                        object_settings.values[kkey] = self._typedValue(index.getType(kkey) or ktype, kvalue)
+                    except ValueError:
+                        Logger.log("w", "Invalid value %s for %s of %s", kvalue, kkey, oname)
+        except:
+            Logger.logException("e", "Could not import the per object settings from the selected file")
+            return
+
+        matched, missing = matchObjects(list(objects.values()))
+        try:
+            count, rejected = applyObjectSettings(matched)
+        except:
+            Logger.logException("e", "Could not apply the per object settings")
+            return
+
+        text = catalog.i18nc("@text", "Imported %d values on %d objects") % (count, len(matched))
+        if missing :
+            text += "\n" + catalog.i18nc("@text", "Objects not found : %s") % ", ".join(object_settings.name for object_settings in missing[:10])
+        if rejected :
+            text += "\n" + catalog.i18nc("@text", "Not settable per object : %s") % ", ".join(sorted(rejected))
+        if ignored :
+            text += "\n" + self._ignoredText(ignored)
+        Message().hide()
+        Message(text, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Files that can be merged in the current settings
+    def _mergeFilters(self) -> List[str]:
+        return [
+            catalog.i18nc("@filter", "CSV files (*.csv)"),
+            catalog.i18nc("@filter", "Cura Profile (*.curaprofile)"),
+            catalog.i18nc("@filter", "G-Code File (*.gcode)"),
+            catalog.i18nc("@filter", "3MF Project (*.3mf)")
+        ]
+
+    # Read a CSV file or the profile of a Cura file as a change set
+    # known_only : the keys of a CSV file unknown for the active printer are ignored, else they are kept
+    # The keys of the Cura files are always typed by the active printer : the unknown keys are ignored
+    def _parseProfileFile(self, file_name: str, known_only: bool = True) -> ProfileTable:
+        extension = file_name.split(".")[-1].lower()
+        if extension == "csv" :
+            return self._parseCsvFile(file_name, known_only)
+        if extension == "curaprofile" :
+            profiles = [sections for member_name, sections in readCuraProfile(file_name)]
+        elif extension == "gcode" :
+            profiles = [parseProfile(serialized.splitlines()) for serialized in readGCodeProfile(file_name)]
+        elif extension == "3mf" :
+            profiles = [parseProfile(serialized.splitlines()) for serialized in readProjectProfile(file_name)]
+        else :
+            raise ValueError("Unknown file type %s" % file_name)
+        return self._profileChanges(profiles)
+
+    # Read a file to merge and apply the merge rules to its values
+    def _readMergeFile(self, file_name: str, known_only: bool = True) -> ProfileTable:
+        table = self._parseProfileFile(file_name, known_only)
+        rules = self._getTransformRules()
+        if not rules.isEmpty() :
+            rules.apply(table)
+        if table.conflicts :
+            # The full list is in the log of the rules
+            conflicts = sorted(table.conflicts)
+            text = ", ".join(conflicts[:10])
+            if len(conflicts) > 10 :
+                text += catalog.i18nc("@text", " and %d more") % (len(conflicts) - 10)
+            Message(catalog.i18nc("@text", "Merge rules : several extruders of %s give %s. The value of the extruder rule is used.") % (os.path.basename(file_name), text),
+                    title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+        return table
+
+    def _getTransformRules(self) -> TransformRules:
+        text = self._preferences.getValue("import_export_tools/transform_rules")
+        if text != self._transform_rules[0] :
+            try:
+                self._transform_rules = (text, TransformRules(text))
+            except ValueError:
+                Logger.logException("w", "Invalid merge rules, ignored")
+                self._transform_rules = (text, TransformRules(""))
+        return self._transform_rules[1]
+
+    # Rules like "scale speed_* 0.8", "add material_print_temperature 5", "extruder 2 1"
+    def editTransformRules(self) -> None:
+        text = self._preferences.getValue("import_export_tools/transform_rules")
+        while True:
+            text, ok = QInputDialog.getMultiLineText(None, catalog.i18nc("@title:window", "Merge Rules"),
+                                                     catalog.i18nc("@label", "One rule per line : scale <pattern> <factor>, add <pattern> <value>, extruder <file> <printer>"),
+                                                     text)
+            if not ok :
+                return
+            try:
+                self._transform_rules = (text, TransformRules(text))
+            except ValueError as e:
+                QMessageBox.warning(None, catalog.i18nc("@title:window", "Merge Rules"), str(e))
+                continue
+            self._preferences.setValue("import_export_tools/transform_rules", text)
+            return
+
+    # Convert the key / value tables of the profiles to the change set used by the CSV files
+    # The global profile is merged as the first extruder, like in the CSV export
+    # index : the setting index of the active printer, read here if not given (main thread only)
+    def _profileChanges(self, profiles, index: Optional[SettingIndex] = None) -> ProfileTable:
+        if index is None :
+            index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        table = ProfileTable()
+        for sections in profiles:
+            general = sections.get("general", {})
+            metadata = sections.get("metadata", {})
+            position = metadata.get("position")
+            if position is None :
+                table.addGeneral("Profile", general.get("name", ""))
+                table.addGeneral("Quality", metadata.get("quality_type", ""))
+                table.addGeneral("Quality_Type", metadata.get("quality_type", ""), label = "Quality Type")
+                table.addGeneral("Machine", general.get("definition", ""))
+                extrud = 0
+            else :
+                extrud = int(position)
+            for kkey, kvalue in sections.get("values", {}).items():
+                if not index.hasKey(kkey) :
+                    table.ignored.add(kkey)
+                    continue
+                table.append(self._typedChange(index, extrud, kkey, kvalue))
+        return table
+
+    # Change of a key / value read without type (Cura files, profile library)
+    def _typedChange(self, index: SettingIndex, extrud: int, kkey: str, kvalue: str) -> SettingRow:
+        ktype = index.getType(kkey) or "str"
+        try:
+            value = self._typedValue(ktype, kvalue)
+        except ValueError:
+            # Kept as string, rejected by the validation
+            value = kvalue
+        return SettingRow("", extrud, kkey, ktype, index.getLabel(kkey) or kkey, value)
+
+    # Merge automatically the CSV & Cura Profile files dropped in a folder
+    def watchFolder(self) -> None:
+        folder = QFileDialog.getExistingDirectory(None, catalog.i18nc("@title:window", "Select a folder"), self._preferences.getValue("import_export_tools/watch_folder"))
+        if not folder:
+            return
+        self._preferences.setValue("import_export_tools/watch_folder", folder)
+        self._startWatchFolder()
+        Message().hide()
+        Message(catalog.i18nc("@text", "Watching the folder %s") % folder, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    def stopWatchFolder(self) -> None:
+        self._update_timer.stop()
+        self._preferences.setValue("import_export_tools/watch_folder", "")
+        self._watched_files = {}
+        self._pending_files = {}
+
+    def _startWatchFolder(self) -> None:
+        # The files already in the folder are the reference, they are not merged
+        self._watched_files = {}
+        self._pending_files = {}
+        for file_name, mtime, size in self._scanWatchFolder():
+            self._pending_files[file_name] = (mtime, size)
+        self._baseline = set(self._pending_files)
+        self._update_timer.start()
+
+    def _scanWatchFolder(self) -> List[Tuple[str, float, int]]:
+        files = []
+        try:
+            with os.scandir(self._preferences.getValue("import_export_tools/watch_folder")) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith((".csv", ".curaprofile")) :
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_mtime, stat.st_size))
+        except OSError:
+            Logger.log("w", "Watched folder not available")
+        return files
+
+    def _pollWatchFolder(self) -> None:
+        if CuraApplication.getInstance().getGlobalContainerStack() is None :
+            return
+
+        for file_name, mtime, size in self._scanWatchFolder():
+            watched = self._watched_files.get(file_name)
+            if watched is not None and watched[0] == mtime and watched[1] == size :
+                # Nothing new : the usual case, only a stat of the file
+                continue
+            if self._pending_files.get(file_name) != (mtime, size) :
+                # Still being written : wait until it is stable during one poll
+                self._pending_files[file_name] = (mtime, size)
+                continue
+            del self._pending_files[file_name]
+            self._mergeWatchedFile(file_name, mtime, size, file_name not in self._baseline)
+            self._baseline.discard(file_name)
+
+    def _mergeWatchedFile(self, file_name: str, mtime: float, size: int, merge: bool) -> None:
+        try:
+            with open(file_name, "rb") as watched_file:
+                content_hash = hashlib.sha1(watched_file.read()).hexdigest()
+        except OSError:
+            return
+
+        watched = self._watched_files.get(file_name)
+        applied = watched[3] if watched is not None else {}  # type: Dict[Tuple[int, str], Any]
+        if watched is not None and watched[2] == content_hash :
+            # Touched but not modified
+            self._watched_files[file_name] = (mtime, size, content_hash, applied)
+            return
+
+        try:
+            table = self._readMergeFile(file_name)
+        except:
+            Logger.logException("w", "Could not read the watched file %s", file_name)
+            return
+
+        # Only the keys modified since the last merge of this file
+        new_changes = [row for row in table if str(applied.get((row.extruder, row.key))) != str(row.value)]
+        Logger.log("d", "Watched file %s : %d modified keys", file_name, len(new_changes))
+        if merge and new_changes :
+            if self._mergeChanges(new_changes, os.path.basename(file_name))["status"] == "ok" :
+                applied = {(row.extruder, row.key): row.value for row in table}
+        else :
+            applied = {(row.extruder, row.key): row.value for row in table}
+        # A rejected merge keeps the previous values : the next version of the file sends the rejected keys again
+        self._watched_files[file_name] = (mtime, size, content_hash, applied)
+
+    def _getLibrary(self) -> ProfileLibrary:
+        if self._library is None :
+            self._library = ProfileLibrary(os.path.join(Resources.getDataStoragePath(), "import_export_profiles.db"))
+        return self._library
+
+    # Add (or update) an exported or ingested file in the profile library
+    def _addFileToLibrary(self, file_name: str) -> bool:
+        try:
+            table = self._parseProfileFile(file_name)
+            rows = [(row.extruder, row.key, row.value) for row in table]
+            if table.getGeneral("Quality_Type") :
+                rows.append((0, "quality_type", table.getGeneral("Quality_Type")))
+            self._getLibrary().addProfile(os.path.abspath(file_name), table.getGeneral("Profile"), table.getGeneral("Machine"), os.path.getmtime(file_name), rows)
+        except:
+            Logger.logException("w", "Could not add %s to the profile library", file_name)
+            return False
+        return True
+
+    # Add every CSV and Cura Profile of a folder to the profile library
+    def ingestLibraryFolder(self) -> None:
+        folder = QFileDialog.getExistingDirectory(None, catalog.i18nc("@title:window", "Select a folder"), self._preferences.getValue("import_export_tools/dialog_path"))
+        if not folder:
+            return
+
+        library = self._getLibrary()
+        added_count = 0
+        for root, dirs, files in os.walk(folder):
+            for name in files:
+                if not name.lower().endswith((".csv", ".curaprofile")) :
+                    continue
+                file_name = os.path.abspath(os.path.join(root, name))
+                if library.isUpToDate(file_name, os.path.getmtime(file_name)) :
+                    continue
+                if self._addFileToLibrary(file_name) :
+                    added_count += 1
+
+        Message().hide()
+        Message(catalog.i18nc("@text", "Profile library : %d files added") % added_count, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Search the profile library and load the selected profile in the active stack
+    def searchLibrary(self) -> None:
+        query, ok = QInputDialog.getText(None, catalog.i18nc("@title", "Profile library"), catalog.i18nc("@text", "Search (example : support_angle > 60 and quality_type = normal)"))
+        if not ok or not query.strip():
+            return
+
+        Message().hide()
+        try:
+            results = self._getLibrary().query(query)
+        except ValueError as e:
+            Message(str(e), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+        if not results :
+            Message(catalog.i18nc("@text", "No profile found"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        items = ["%s (%s) | %d | %s | %s" % (name, machine, extruder + 1, value, source) for profile_id, name, machine, source, extruder, value in results]
+        item, ok = QInputDialog.getItem(None, catalog.i18nc("@title", "Profile library"), catalog.i18nc("@text", "Load into the active printer :"), items, 0, False)
+        if not ok :
+            return
+        self._loadLibraryProfile(results[items.index(item)][0])
+
+    def _loadLibraryProfile(self, profile_id: int) -> None:
+        index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        changes = [self._typedChange(index, extrud, kkey, kvalue) for extrud, kkey, kvalue in self._getLibrary().profileRows(profile_id) if kkey != "quality_type"]
+        self._mergeChanges(changes, "")
+
+    # Validate and apply a change set on the active printer, without confirmation
+    # Return the status, the number of changed keys, the errors & warnings of the validation
+    # snapshot : save the current settings in the history first, notify : display the result
+    def _mergeChanges(self, changes, profile_name: str, details: str = "", snapshot: bool = True, notify: bool = True) -> Dict[str, Any]:
+        if notify :
+            Message().hide()
+        errors, warnings = validateChanges(changes, CuraApplication.getInstance().getGlobalContainerStack())
+        if errors :
+            if notify :
+                self._showValidationErrors(errors)
+            return {"status": "error", "changed": 0, "errors": errors, "warnings": warnings}
+
+        # Automatic merges (watched folder, server) can't ask the name of a new custom profile
+        targets = self._prepareImportTargets(profile_name, interactive = False)
+        if snapshot :
+            self._takeSnapshot("Merge " + profile_name)
+        transaction = ProfileTransaction()
+        imported_count, aborted = self._applyChanges(changes, False, transaction, targets)
+        if not transaction.commit() :
+            if notify :
+                Message(catalog.i18nc("@text", "Import failed : the profile has been restored"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return {"status": "error", "changed": 0, "errors": ["The profile could not be written"], "warnings": warnings}
+        if transaction.changedCount() :
+            self._last_transaction = transaction
+            self._saveImportTargets(targets)
+        layer_keys = self._layerKeys(changes)
+        if notify :
+            text = catalog.i18nc("@text", "Imported profile : %d changed keys from %s") % (imported_count, profile_name)
+            if details :
+                text += "\n" + details
+            if layer_keys :
+                text += "\n" + self._layerText(layer_keys)
+            Message(text, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+        return {"status": "ok", "changed": imported_count, "errors": [], "warnings": warnings, "not_written": layer_keys}
+
+    # The rows of a change set different from the settings of the active printer
+    def _diffChanges(self, changes) -> List[Dict[str, Any]]:
+        extruder_stack = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+        differences = []  # type: List[Dict[str, Any]]
+        for row in changes:
+            if row.extruder < 0 or row.extruder >= len(extruder_stack):
+                continue
+            container = extruder_stack[row.extruder]
+            prop_value = container.getProperty(row.key, "value")
+            if prop_value is None :
+                continue
+            try:
+                same = self._sameValue(container, row, prop_value)
+            except (TypeError, ValueError):
+                same = False
+            if not same :
+                differences.append({"extruder": row.extruder + 1, "key": row.key, "current": str(prop_value), "value": str(row.value)})
+        return differences
+
+    # The (container, user changes of its stack) named by the source of a row, None for the other sources
+    # A source without custom profile on this printer goes to the user changes
+    # Like the ExtruderStack, a setting not settable per extruder goes to the global stack
+    def _sourceContainer(self, global_stack, extruder_stack, source: str, key: str) -> Optional[Tuple[Any, Any]]:
+        scope, separator, container_type = source.partition(":")
+        if container_type not in ("user", "quality_changes") :
+            return None
+        stack = global_stack if scope == "global" or extruder_stack.getProperty(key, "settable_per_extruder") != True else extruder_stack
+        if container_type == "quality_changes" and stack.qualityChanges.getId() != "empty_quality_changes" :
+            return stack.qualityChanges, stack.userChanges
+        return stack.userChanges, stack.userChanges
+
+    # True if the value of a row is already the value of the stack
+    def _sameValue(self, container, row: SettingRow, prop_value: Any) -> bool:
+        if isinstance(row.value, SettingFunction) :
+            # Only a formula different from the current one is an override
+            return str(container.getRawProperty(row.key, "value")) == str(row.value)
+        if row.type == "float" :
+            return round(prop_value,4) == row.value
+        if row.type in ("str", "enum", "bool", "int") :
+            return prop_value == row.value
+        return str(prop_value) == str(row.value)
+
+    # Convert the CSV value to the type of the setting
+    # Tables (polygons, extruder ...) are kept as string
+    def _typedValue(self, ktype: str, kvalue: str) -> Any:
+        if kvalue.startswith("=") :
+            # Formula exported by Export Current Settings with Formulas
+            return SettingFunction(kvalue[1:])
+        if ktype == "bool" :
+            if kvalue in ("True", "true") :
+                return True
+            if kvalue in ("False", "false") :
+                return False
+            raise ValueError("'%s' is not a boolean" % kvalue)
+        if ktype == "int" :
+            return int(kvalue)
+        if ktype == "float" :
+            return round(float(kvalue),4)
+        return kvalue
+
+    # Read a CSV file once and return the general informations and the typed change set
+    # The keys renamed since the Cura version of the file are migrated while reading
+    def _parseCsvFile(self, file_name: str, known_only: bool = True) -> ProfileTable:
+        with open(file_name, 'r', newline='') as csv_file:
+            return self._parseCsvStream(csv_file, file_name, known_only = known_only)
+
+    # index : the setting index of the active printer, read here if not given (main thread only)
+    # known_only : ignore the keys unknown for the active printer
+    def _parseCsvStream(self, csv_file, file_name: str, index: Optional[SettingIndex] = None, known_only: bool = True) -> ProfileTable:
+        if index is None :
+            index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        # Old key -> new key (None if removed), set by the Cura_Version row of the file
+        migration = {}  # type: Dict[str, Optional[str]]
+        table = ProfileTable()
+        C_dialect = csv.Sniffer().sniff(csv_file.read(1024))
+        # Reset to begining file position
+        csv_file.seek(0, 0)
+        Logger.log("d", "Csv Import %s : Delimiter = %s Quotechar = %s", file_name, C_dialect.delimiter, C_dialect.quotechar)
+        csv_reader = csv.reader(csv_file, dialect=C_dialect)
+        line_number = -1
+        for row in csv_reader:
+            line_number += 1
+            if line_number == 0:
+                continue
+            try:
+                section=row[0]
+                extrud=int(row[1]) - 1
+                kkey=row[2]
+                ktype=row[3]
+                klbl=row[4]
+                kvalue=row[5]
+                ksource=row[6] if len(row) > 6 else ""
+            except:
+                Logger.log("e", "Row does not have enough data: %s" % row)
+                continue
+
+            if section == "general" :
+                table.addGeneral(kkey, kvalue, ktype, klbl)
+                if kkey == "Cura_Version" :
+                    source_version = parseVersion(kvalue)
+                    if source_version is not None :
+                        migration = migrationMap(source_version, (self.Major, self.Minor))
+                        Logger.log("d", "Csv Import from Cura %s : %d migrated keys", kvalue, len(migration))
+                continue
+
+            if kkey in migration :
+                new_key = migration[kkey]
+                if new_key is None :
+                    table.ignored.add(kkey)
+                    continue
+                klbl = index.getLabel(new_key) or klbl
+                kkey = new_key
+            if known_only and not index.hasKey(kkey) :
+                table.ignored.add(kkey)
+                continue
+
+            try:
+                table.append(SettingRow(section, extrud, kkey, ktype, klbl, self._typedValue(ktype, kvalue), ksource))
+            except ValueError:
+                # Kept as string, rejected by the validation
+                table.append(SettingRow(section, extrud, kkey, ktype, klbl, kvalue, ksource))
+        return table
+
+    # Stage a change set on the active machine, the values are written when the transaction is committed
+    # Return the number of changed keys and True if the user aborted the import
+    # targets : the (global, extruders) containers to write, the user changes by default
+    def _applyChanges(self, changes, byStep: bool, transaction: ProfileTransaction, targets: Optional[Tuple[Any, List[Any]]] = None) -> Tuple[int, bool]:
+        stack = CuraApplication.getInstance().getGlobalContainerStack()
+        #Get extruder count
+        extruder_count=stack.getProperty("machine_extruder_count", "value")
+        extruder_stack = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+        if targets is None :
+            targets = (stack.userChanges, [extruder.userChanges for extruder in extruder_stack])
+        global_target, extruder_targets = targets
+        # The values written in a custom profile are below the user changes
+        below_user = global_target is not stack.userChanges
+
+        imported_count = 0
+        for row in changes:
+            extrud, kkey, ktype, klbl, kvalue = row.extruder, row.key, row.type, row.label, row.value
+            if extrud < 0 or extrud >= extruder_count or extrud >= len(extruder_stack):
+                Logger.log("d", "Error Extruder: %s %d" % (kkey, extrud + 1))
+                continue
+            container=extruder_stack[extrud]
+            update_setting = 1
+            try:
+                prop_value = container.getProperty(kkey, "value")
+                if prop_value == None :
+                    continue
+
+                # Exported with its container : written back in the same container
+                # The values of the quality, material, variant or definition of the source printer are not overrides
+                if row.source :
+                    source_containers = self._sourceContainer(stack, container, row.source, kkey)
+                    if source_containers is None :
+                        Logger.log("d", "%s from %s not written", kkey, row.source)
+                        continue
+                    target, user_changes = source_containers
+                    shadowed = target is not user_changes and user_changes.hasProperty(kkey, "value")
+                    if target.hasProperty(kkey, "value") and str(target.getProperty(kkey, "value")) == str(kvalue) and not shadowed :
+                        continue
+                    if byStep :
+                        update_setting = self.changeValue(self._translateLabel(kkey, klbl))
+                    if update_setting == 1 :
+                        self._stageValue(transaction, target, user_changes, kkey, kvalue)
+                        Logger.log("d", "prop_value changed in %s: %s = %s / %s", row.source, kkey ,kvalue, prop_value)
+                        imported_count += 1
+                elif ktype in ("str", "enum", "bool", "int", "float") :
+                    # A value of the user changes hides the value of the custom profile : it is written anyway
+                    shadowed = below_user and (stack.userChanges.hasProperty(kkey, "value") or container.userChanges.hasProperty(kkey, "value"))
+                    if self._sameValue(container, row, prop_value) and not shadowed :
+                        continue
+
+                    staged = False
+                    settable_per_extruder= container.getProperty(kkey, "settable_per_extruder")
+                    if extrud == 0 :
+                        if byStep :
+                            update_setting = self.changeValue(self._translateLabel(kkey, klbl))
+                            Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
+                        if update_setting == 1 :
+                            self._stageValue(transaction, global_target, stack.userChanges, kkey, kvalue)
+                            staged = True
+                            Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,kvalue, prop_value)
+
+                    if settable_per_extruder == True and extruder_targets[extrud] is None :
+                        Logger.log("d", "%s : no custom profile for the extruder %d", kkey, extrud + 1)
+                    elif settable_per_extruder == True :
+                        Logger.log("d", "settable_per_extruder : %s / %s = %s", kkey ,klbl, update_setting)
+                        if byStep and update_setting == 0 :
+                            update_setting = self.changeValue(catalog.i18nc("@text", "Per extruder  %s") % (self._translateLabel(kkey, klbl)))
+                        if update_setting == 1 :
+                            self._stageValue(transaction, extruder_targets[extrud], container.userChanges, kkey, kvalue)
+                            staged = True
+                            Logger.log("d", "prop_value per extruder changed: %s = %s / %s", kkey ,kvalue, prop_value)
                     else:
-                        # Logger.log("d", "Import Data = %s | %s | %s | %s | %s | %s",row[0], row[1], row[2], row[3], row[4], row[5])
-                        try:
-                            #(section, extrud, kkey, ktype, kvalue) = row[0:5]
-                            section=row[0]
-                            extrud=int(row[1])
-                            extrud -= 1
-                            kkey=row[2]
-                            ktype=row[3]
-                            klbl=row[4]
-                            definition_key=kkey + " label"
-                            translated_label=i18n_catalog.i18nc(definition_key, klbl)
-                            kvalue=row[5]
-                            
-                            # Logger.log("d", "Current Data = %s | %d | %s | %s | %s | %s", section,extrud, kkey, ktype, klbl, kvalue) 
-                            update_setting = 1                            
-                            if extrud<extruder_count:
-                                try:
-                                    container=extruder_stack[extrud]
-                                    try:
-                                        prop_value = container.getProperty(kkey, "value")
-                                        if prop_value != None :
-                                            
-                                            settable_per_extruder= container.getProperty(kkey, "settable_per_extruder")
-                                            # Logger.log("d", "%s settable_per_extruder : %s", kkey, str(settable_per_extruder))
-                                            
-                                            if ktype == "str" or ktype == "enum":
-                                                if prop_value != kvalue :
-                                                    if extrud == 0 :
-                                                        if byStep :
-                                                            update_setting = self.changeValue(translated_label)
-                                                            Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if update_setting == 1 :
-                                                            stack.setProperty(kkey,"value",kvalue)
-                                                            Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,kvalue, prop_value)
-                                                            
-                                                    if settable_per_extruder == True : 
-                                                        Logger.log("d", "settable_per_extruder : %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if byStep and update_setting == 0 :
-                                                            update_setting = self.changeValue(catalog.i18nc("@text", "Per extruder  %s") % (translated_label))
-                                                        if update_setting == 1 :
-                                                            container.setProperty(kkey,"value",kvalue)
-                                                            Logger.log("d", "prop_value per extruder changed: %s = %s / %s", kkey ,kvalue, prop_value)
-                                                    else:
-                                                        Logger.log("d", "%s not settable_per_extruder", kkey)
-                                                    imported_count += 1
-                                                    
-                                            elif ktype == "bool" :
-                                                if kvalue == "True" or kvalue == "true" :
-                                                    C_bool=True
-                                                else:
-                                                    C_bool=False
-                                                
-                                                if prop_value != C_bool :
-                                                    if extrud == 0 :
-                                                        if byStep :
-                                                            update_setting = self.changeValue(translated_label)
-                                                            Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if update_setting == 1 :
-                                                            stack.setProperty(kkey,"value",C_bool)
-                                                            Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,C_bool, prop_value)
-                                                        
-                                                    if settable_per_extruder == True : 
-                                                        Logger.log("d", "settable_per_extruder : %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if byStep and update_setting == 0 :
-                                                            update_setting = self.changeValue(catalog.i18nc("@text", "Per extruder  %s") % (translated_label))
-                                                        if update_setting == 1 :
-                                                            container.setProperty(kkey,"value",C_bool)
-                                                            Logger.log("d", "prop_value per extruder changed: %s = %s / %s", kkey ,C_bool, prop_value)
-                                                    else:
-                                                        Logger.log("d", "%s not settable_per_extruder", kkey)
-                                                    imported_count += 1
-                                                    
-                                            elif ktype == "int" :
-                                                if prop_value != int(kvalue) :
-                                                    if extrud == 0 :
-                                                        if byStep :
-                                                            update_setting = self.changeValue(translated_label)
-                                                        if update_setting == 1 :
-                                                            stack.setProperty(kkey,"value",int(kvalue))
-                                                            Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,kvalue, prop_value)
-                                                        
-                                                    if settable_per_extruder == True :
-                                                        Logger.log("d", "settable_per_extruder : %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if byStep and update_setting == 0 :
-                                                            update_setting = self.changeValue(catalog.i18nc("@text", "Per extruder  %s") % (translated_label))
-                                                        if update_setting :
-                                                            container.setProperty(kkey,"value",int(kvalue))
-                                                            Logger.log("d", "prop_value per extruder changed: %s = %s / %s", kkey ,int(kvalue), prop_value)
-                                                    else:
-                                                        Logger.log("d", "%s not settable_per_extruder", kkey)
-                                                    imported_count += 1
-                                            
-                                            elif ktype == "float" :
-                                                TransVal=round(float(kvalue),4)
-                                                if round(prop_value,4) != TransVal :
-                                                    if extrud == 0 :
-                                                        if byStep :
-                                                            update_setting = self.changeValue(translated_label)
-                                                            Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if update_setting == 1 :
-                                                            stack.setProperty(kkey,"value",TransVal)
-                                                            Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,TransVal, round(prop_value,4))
-                                                            
-                                                    if settable_per_extruder == True : 
-                                                        Logger.log("d", "settable_per_extruder : %s / %s = %s", kkey ,klbl, update_setting)
-                                                        if byStep and update_setting == 0 :
-                                                            update_setting = self.changeValue(catalog.i18nc("@text", "Per extruder  %s") % (translated_label))
-                                                        if update_setting == 1 :
-                                                            container.setProperty(kkey,"value",TransVal)
-                                                            Logger.log("d", "prop_value per extruder changed: %s = %s / %s", kkey ,TransVal, prop_value)
-                                                    else:
-                                                        Logger.log("d", "%s not settable_per_extruder", kkey)
-                                                        
-                                                    imported_count += 1
-                                            else :
-                                                # Case of the tables                                              
-                                                try:
-                                                    if byStep :
-                                                        update_setting = self.changeValue(translated_label)
-                                                        Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
-                                                    if update_setting == 1 :
-                                                        container.setProperty(kkey,"value",kvalue)
-                                                        Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,kvalue, ktype)
-                                                except:
-                                                    Logger.log("d", "Value type Else = %d | %s | %s | %s",extrud, kkey, ktype, kvalue)
-                                                    continue
-                                            if update_setting == -1 :   
-                                                Logger.log("d", "Abort")
-                                                break
-                                        else:
-                                            # Logger.log("d", "Current Data = %s | %d | %s | %s | %s | %s", section,extrud, kkey, ktype, klbl, kvalue) 
-                                            if kkey=="Profile" :
-                                                CPro=kvalue                                               
-                                    except:
-                                        Logger.log("d", "Error kkey: %s" % kkey)
-                                        continue                                       
-                                except:
-                                    Logger.log("d", "Error Extruder: %s" % row)
-                                    continue                             
-                        except:
-                            Logger.log("e", "Row does not have enough data: %s" % row)
+                        Logger.log("d", "%s not settable_per_extruder", kkey)
+                    if staged :
+                        imported_count += 1
+                else :
+                    # Case of the tables
+                    # Like the ExtruderStack, a setting not settable per extruder is written in the global container
+                    if container.getProperty(kkey, "settable_per_extruder") == True :
+                        if extruder_targets[extrud] is None :
+                            Logger.log("d", "%s : no custom profile for the extruder %d", kkey, extrud + 1)
                             continue
-                            
+                        table_target, user_changes = extruder_targets[extrud], container.userChanges
+                    elif extrud == 0 :
+                        table_target, user_changes = global_target, stack.userChanges
+                    else :
+                        Logger.log("d", "%s not settable_per_extruder", kkey)
+                        continue
+                    if byStep :
+                        update_setting = self.changeValue(self._translateLabel(kkey, klbl))
+                        Logger.log("d", "prop_value changed: %s / %s = %s", kkey ,klbl, update_setting)
+                    if update_setting == 1 :
+                        self._stageValue(transaction, table_target, user_changes, kkey, kvalue)
+                        imported_count += 1
+                        Logger.log("d", "prop_value changed: %s = %s / %s", kkey ,kvalue, ktype)
+            except:
+                Logger.log("d", "Error kkey: %s" % kkey)
+                continue
+
+            if update_setting == -1 :
+                Logger.log("d", "Abort")
+                return imported_count, True
+
+        return imported_count, False
+
+    # Stage a value in its target, and remove the value of the user changes that would hide it
+    def _stageValue(self, transaction: ProfileTransaction, target, user_changes, key: str, value: Any) -> None:
+        transaction.setValue(target, key, value)
+        if target is not user_changes and user_changes.hasProperty(key, "value") :
+            transaction.removeValue(user_changes, key)
+
+    # Container written by the merges : user changes, active custom profile or new custom profile
+    def selectImportTarget(self) -> None:
+        targets = ["user", "quality_changes", "new_quality_changes"]
+        items = [
+            catalog.i18nc("@item", "User changes (not saved in a profile)"),
+            catalog.i18nc("@item", "Active custom profile"),
+            catalog.i18nc("@item", "New custom profile")
+        ]
+        current = self._preferences.getValue("import_export_tools/import_target")
+        item, ok = QInputDialog.getItem(None, catalog.i18nc("@title:window", "Merge Target"), catalog.i18nc("@label", "Write the merged values in :"),
+                                        items, targets.index(current) if current in targets else 0, False)
+        if ok :
+            self._preferences.setValue("import_export_tools/import_target", targets[items.index(item)])
+
+    # The (global, extruders) containers of the merge target, None if the merge is cancelled
+    # An extruder container is None if the extruder has no custom profile, its values are not written
+    def _prepareImportTargets(self, profile_name: str, interactive: bool = True) -> Optional[Tuple[Any, List[Any]]]:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        extruders = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+        target = self._preferences.getValue("import_export_tools/import_target")
+        if target == "quality_changes" and global_stack.qualityChanges.getId() == "empty_quality_changes" :
+            # No active custom profile : a new one is created
+            target = "new_quality_changes"
+        if target == "new_quality_changes" :
+            if not interactive :
+                target = "quality_changes" if global_stack.qualityChanges.getId() != "empty_quality_changes" else "user"
+            else :
+                name, ok = QInputDialog.getText(None, catalog.i18nc("@title:window", "New Custom Profile"), catalog.i18nc("@label", "Profile name :"), text = profile_name)
+                if not ok or not name.strip() :
+                    return None
+                self._createQualityChanges(global_stack, extruders, name.strip())
+                target = "quality_changes"
+        if target == "quality_changes" :
+            # None for an extruder without custom profile : the empty container is shared by all the printers
+            return global_stack.qualityChanges, [extruder.qualityChanges if extruder.qualityChanges.getId() != "empty_quality_changes" else None for extruder in extruders]
+        return global_stack.userChanges, [extruder.userChanges for extruder in extruders]
+
+    # Create and activate an empty custom profile for the current quality, all the containers at once
+    def _createQualityChanges(self, global_stack, extruders, name: str) -> None:
+        registry = CuraApplication.getInstance().getContainerRegistry()
+        name = registry.uniqueName(name)
+        quality_type = global_stack.quality.getMetaDataEntry("quality_type")
+        definition_id = ContainerTree.getInstance().machines[global_stack.definition.getId()].quality_definition
+        containers = []
+        for stack in [global_stack] + list(extruders):
+            container_id = registry.uniqueName((stack.getId() + "_" + name).lower().replace(" ", "_"))
+            container = InstanceContainer(container_id)
+            container.setName(name)
+            container.setMetaDataEntry("type", "quality_changes")
+            container.setMetaDataEntry("quality_type", quality_type)
+            container.setMetaDataEntry("definition", definition_id)
+            container.setMetaDataEntry("setting_version", CuraApplication.SettingVersion)
+            intent_category = stack.intent.getMetaDataEntry("intent_category", "default")
+            if intent_category != "default" :
+                container.setMetaDataEntry("intent_category", intent_category)
+            if stack is not global_stack :
+                container.setMetaDataEntry("position", stack.getMetaDataEntry("position"))
+            containers.append(container)
+        for container in containers:
+            registry.addContainer(container)
+        global_stack.qualityChanges = containers[0]
+        for extruder, container in zip(extruders, containers[1:]):
+            extruder.qualityChanges = container
+        Logger.log("d", "New custom profile %s for the merge", name)
+
+    # The custom profile containers of the active printer, (global, extruders)
+    def _qualityChangesTargets(self) -> Tuple[Any, List[Any]]:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        extruders = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+        return global_stack.qualityChanges, [extruder.qualityChanges for extruder in extruders]
+
+    # Remove the custom profile created for a merge that was not written, the previous profile is activated again
+    def _discardImportTargets(self, targets: Tuple[Any, List[Any]], previous_targets: Tuple[Any, List[Any]]) -> None:
+        if targets[0] is previous_targets[0] or targets[0].getMetaDataEntry("type") != "quality_changes" :
+            return
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        extruders = CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks()
+        # Still active unless the user changed of profile or printer since the merge
+        if global_stack.qualityChanges is targets[0] :
+            global_stack.qualityChanges = previous_targets[0]
+            for extruder, container in zip(extruders, previous_targets[1]):
+                extruder.qualityChanges = container
+        registry = CuraApplication.getInstance().getContainerRegistry()
+        for container in [targets[0]] + list(targets[1]):
+            if container is not None :
+                registry.removeContainer(container.getId())
+        Logger.log("d", "Custom profile %s removed", targets[0].getName())
+
+    # One save of the written custom profile, the user changes are not saved
+    def _saveImportTargets(self, targets: Tuple[Any, List[Any]]) -> None:
+        if targets[0].getMetaDataEntry("type") == "quality_changes" :
+            CuraApplication.getInstance().saveSettings()
+
+    # Merge a CSV file in the custom profiles of several printers, without activating them
+    def importDataMachines(self) -> None:
+        file_name = self._getOpenFileName(self._mergeFilters())
+        if not file_name:
+            Logger.log("d", "No file to import from selected")
+            return
+
+        self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_name))
+
+        try:
+            # Not filtered by the active printer : the keys are checked on every selected printer
+            table = self._readMergeFile(file_name, known_only = False)
         except:
             Logger.logException("e", "Could not import settings from the selected file")
             return
 
+        machines = self._selectMachines()
+        if not machines:
+            Logger.log("d", "No printer selected")
+            return
+
+        transaction = ProfileTransaction()
+        report = []
+        for machine in machines:
+            errors, warnings = validateChanges(table.rows, machine)
+            if errors :
+                report.append(catalog.i18nc("@text", "%s : rejected, %d invalid values") % (machine.getName(), len(errors)))
+                continue
+            applied, skipped, not_applicable = self._stageMachineChanges(machine, table.rows, transaction)
+            Logger.log("d", "Merge %s into %s : applied %s / skipped %s / not applicable %s", file_name, machine.getName(), applied, skipped, not_applicable)
+            report.append(catalog.i18nc("@text", "%s : %d applied, %d skipped, %d not applicable") % (machine.getName(), len(applied), len(skipped), len(not_applicable)))
+
+        Message().hide()
+        if not transaction.commit() :
+            Message(catalog.i18nc("@text", "Import failed : the profile has been restored"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        if transaction.changedCount() :
+            self._last_transaction = transaction
+            # One save for the custom profiles of all the printers
+            CuraApplication.getInstance().saveSettings()
+        if table.ignored :
+            report.append(self._ignoredText(table.ignored))
+        Message("\n".join(report), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Which values of several files could be merged in several printers, nothing is modified
+    def fleetReport(self) -> None:
+        file_names = self._getOpenFileNames(self._mergeFilters())
+        if not file_names:
+            Logger.log("d", "No file to import from selected")
+            return
+        self._preferences.setValue("import_export_tools/dialog_path", os.path.dirname(file_names[0]))
+
+        profiles = []  # type: List[Tuple[str, ProfileTable]]
+        for file_name in file_names:
+            try:
+                # The keys unknown for the active printer are checked on the other printers
+                profiles.append((os.path.basename(file_name), self._readMergeFile(file_name, known_only = False)))
+            except:
+                Logger.logException("e", "Could not read %s", file_name)
+        machines = self._selectMachines()
+        if not profiles or not machines:
+            return
+
+        try:
+            results = analyseFleet(profiles, machines, self._quality_resolver)
+        except:
+            Logger.logException("e", "Could not analyse the compatibility of the files")
+            return
+
+        file_name = self._getSaveFileName("compatibility.csv", catalog.i18nc("@filter", "CSV files (*.csv)"))
+        if not file_name:
+            Logger.log("d", "No file to export selected")
+            return
+        # Keys of the Cura files unknown for the active printer, their type can't be checked
+        not_checked = {profile_name: " | ".join(sorted(table.ignored)) for profile_name, table in profiles}
+        try:
+            with open(file_name, 'w', newline='') as csv_file:
+                csv_writer = csv.writer(csv_file, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                csv_writer.writerow(["Profile", "Machine", "Applicable", "Rejected", "Disabled", "Quality_Type", "Substitute", "Rejected_Keys", "Disabled_Keys", "Not_Checked_Keys"])
+                for result in results:
+                    substitute = result.substitute if result.substitute != result.quality_type else ""
+                    if result.quality_type and result.substitute is None :
+                        substitute = "not available"
+                    csv_writer.writerow([result.profile, result.machine, result.applicable, len(result.rejected), len(result.disabled),
+                                         result.quality_type, substitute, " | ".join(result.rejected), " | ".join(result.disabled), not_checked[result.profile]])
+        except:
+            Logger.logException("e", "Could not write the compatibility report")
+            return
+
+        clean = sum(1 for result in results if not result.rejected)
         Message().hide()
-        Message(catalog.i18nc("@text", "Imported profile : %d changed keys from %s") % (imported_count, CPro) , title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+        Message(catalog.i18nc("@text", "%d of %d file / printer pairs can be merged without rejected value") % (clean, len(results)), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Stage the change set in the quality_changes containers of a printer
+    # Return the keys applied, skipped (same value) and not applicable on this printer
+    def _stageMachineChanges(self, global_stack, changes, transaction: ProfileTransaction) -> Tuple[List[str], List[str], List[str]]:
+        applied = []  # type: List[str]
+        skipped = []  # type: List[str]
+        not_applicable = []  # type: List[str]
+
+        global_changes = global_stack.qualityChanges
+        if global_changes.getId() == "empty_quality_changes" :
+            # No custom profile to merge into
+            not_applicable = [row.key for row in changes]
+            return applied, skipped, not_applicable
+
+        extruders = global_stack.extruderList
+        for row in changes:
+            extrud, kkey, ktype, kvalue = row.extruder, row.key, row.type, row.value
+            if extrud < 0 or extrud >= len(extruders) or global_stack.getSettingDefinition(kkey) is None :
+                not_applicable.append(kkey)
+                continue
+            extruder = extruders[extrud]
+            try:
+                prop_value = extruder.getProperty(kkey, "value")
+                if isinstance(kvalue, SettingFunction) :
+                    unchanged = str(extruder.getRawProperty(kkey, "value")) == str(kvalue)
+                elif ktype == "float" :
+                    unchanged = round(prop_value,4) == kvalue
+                else:
+                    unchanged = prop_value == kvalue
+            except:
+                unchanged = False
+            if unchanged :
+                skipped.append(kkey)
+                continue
+
+            settable_per_extruder = global_stack.getProperty(kkey, "settable_per_extruder") == True
+            extruder_changes = extruder.qualityChanges
+            has_extruder_changes = extruder_changes.getId() != "empty_quality_changes"
+            # The tables (polygons, extruder lists ...) are only written in one container
+            write_global = extrud == 0 and (ktype in ("str", "enum", "bool", "int", "float") or not settable_per_extruder)
+            write_extruder = settable_per_extruder and has_extruder_changes
+            if not write_global and not write_extruder :
+                # Global setting of another extruder, or extruder without custom profile
+                not_applicable.append(kkey)
+                continue
+            if write_global :
+                transaction.setValue(global_changes, kkey, kvalue)
+            if write_extruder :
+                transaction.setValue(extruder_changes, kkey, kvalue)
+            applied.append(kkey)
+        return applied, skipped, not_applicable
+
+    def _selectMachines(self) -> List[Any]:
+        '''Let the user pick the printers to update in the list of the defined printers.'''
+        machines = CuraApplication.getInstance().getContainerRegistry().findContainerStacks(type = "machine")
+        machines = sorted(machines, key = lambda machine: machine.getName())
+
+        dialog = QDialog()
+        dialog.setWindowTitle(catalog.i18nc("@title", "Select the printers"))
+        layout = QVBoxLayout(dialog)
+        machine_list = QListWidget(dialog)
+        machine_list.setSelectionMode(QAbstractItemView.MultiSelection if VERSION_QT5 else QAbstractItemView.SelectionMode.MultiSelection)
+        for machine in machines:
+            machine_list.addItem(machine.getName())
+        layout.addWidget(machine_list)
+        buttons = QDialogButtonBox((QDialogButtonBox.Ok if VERSION_QT5 else QDialogButtonBox.StandardButton.Ok) | (QDialogButtonBox.Cancel if VERSION_QT5 else QDialogButtonBox.StandardButton.Cancel), parent = dialog)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+
+        if not dialog.exec():
+            return []
+        return [machines[machine_list.row(item)] for item in machine_list.selectedItems()]
+
+    # Snapshot history, the oldest snapshots are removed once per session
+    def _getSnapshots(self) -> SnapshotStore:
+        if self._snapshots is None :
+            self._snapshots = SnapshotStore(os.path.join(Resources.getDataStoragePath(), "import_export_snapshots"))
+            try:
+                self._snapshots.prune(_SNAPSHOT_COUNT)
+            except OSError:
+                Logger.logException("w", "Could not prune the snapshots")
+        return self._snapshots
+
+    # Keep the overrides of the active printer in the snapshot history
+    def _takeSnapshot(self, reason: str) -> None:
+        try:
+            self._getSnapshots().save(self._collectOverrides(), reason)
+        except:
+            Logger.logException("w", "Could not take a snapshot of the profile")
+
+    # The raw values of the user changes & custom profile of every stack, tagged with their container
+    # Only the overrides are read : the cost depends on the number of changed keys, not on the setting tree
+    def _collectOverrides(self) -> ProfileTable:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        index = SettingIndex.forStack(global_stack)
+        table = ProfileTable()
+        self._addGeneralRows(table, global_stack, global_stack.getProperty("machine_extruder_count", "value"))
+        for scope, position, stack in self._writableStacks(global_stack):
+            for container in (stack.userChanges, stack.qualityChanges):
+                if container.getId() == "empty_quality_changes" :
+                    continue
+                source = "%s:%s" % (scope, container.getMetaDataEntry("type"))
+                for key in sorted(container.getAllKeys()):
+                    # Formulas are kept as =expression
+                    value = container.getProperty(key, "value")
+                    table.append(SettingRow(index.getCategory(key) or "", position, key, index.getType(key) or "str", index.getLabel(key) or key, str(value), source))
+        return table
+
+    # (scope, extruder position, stack) of the global stack and the active extruders
+    def _writableStacks(self, global_stack) -> List[Tuple[str, int, Any]]:
+        stacks = [("global", 0, global_stack)]
+        stacks += [("extruder", position, extruder) for position, extruder in enumerate(CuraApplication.getInstance().getExtruderManager().getActiveExtruderStacks())]
+        return stacks
+
+    # Restore a snapshot : the older snapshots are merged, only the values different from the current settings are written
+    def restoreSnapshot(self) -> None:
+        Message().hide()
+        try:
+            snapshots = self._getSnapshots().snapshots()
+        except OSError:
+            Logger.logException("e", "Could not read the snapshots")
+            snapshots = []
+        if not snapshots :
+            Message(catalog.i18nc("@text", "No snapshot"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        items = ["%s | %s | %s (%s)" % (date, reason, profile, machine) for snapshot_id, date, reason, profile, machine in snapshots]
+        item, ok = QInputDialog.getItem(None, catalog.i18nc("@title", "Snapshots"), catalog.i18nc("@text", "Restore into the active printer :"), items, 0, False)
+        if not ok :
+            return
+        snapshot_id, date = snapshots[items.index(item)][0:2]
+        try:
+            table = self._getSnapshots().load(snapshot_id)
+        except (OSError, ValueError):
+            Logger.logException("e", "Could not read the snapshot %s", snapshot_id)
+            return
+        self._restoreOverrides(table, date)
+
+    # Put back the user changes & custom profile of a snapshot, container by container
+    # The formulas are restored as formulas and the keys added since the snapshot are removed
+    # The custom profile is only restored if the snapshot was taken with the same custom profile
+    def _restoreOverrides(self, table: ProfileTable, date: str) -> None:
+        global_stack = CuraApplication.getInstance().getGlobalContainerStack()
+        index = SettingIndex.forStack(global_stack)
+        same_profile = table.getGeneral("Profile") == global_stack.qualityChanges.getMetaData().get("name", "")
+        # (scope, extruder position, container type) -> container, and the values it must have
+        containers = {}  # type: Dict[Tuple[str, int, str], Any]
+        for scope, position, stack in self._writableStacks(global_stack):
+            containers[(scope, position, "user")] = stack.userChanges
+            if same_profile and stack.qualityChanges.getId() != "empty_quality_changes" :
+                containers[(scope, position, "quality_changes")] = stack.qualityChanges
+        wanted = {container_key: {} for container_key in containers}  # type: Dict[Tuple[str, int, str], Dict[str, SettingRow]]
+        not_restored = 0
+        for row in table:
+            scope, separator, container_type = row.source.partition(":")
+            container_key = (scope, row.extruder, container_type)
+            if container_key not in wanted or not index.hasKey(row.key) :
+                not_restored += 1
+                continue
+            wanted[container_key][row.key] = row
+
+        self._takeSnapshot("Restore " + date)
+        transaction = ProfileTransaction()
+        for container_key, container in containers.items():
+            rows = wanted[container_key]
+            for key in container.getAllKeys():
+                if key not in rows :
+                    transaction.removeValue(container, key)
+            for key, row in rows.items():
+                if container.hasProperty(key, "value") and str(container.getProperty(key, "value")) == row.value :
+                    continue
+                try:
+                    transaction.setValue(container, key, self._typedValue(row.type, row.value))
+                except ValueError:
+                    transaction.setValue(container, key, row.value)
+
+        Message().hide()
+        if not transaction.commit() :
+            Message(catalog.i18nc("@text", "Restore failed : the settings have not been changed"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+        if transaction.changedCount() :
+            self._last_transaction = transaction
+            if same_profile and global_stack.qualityChanges.getId() != "empty_quality_changes" :
+                CuraApplication.getInstance().saveSettings()
+        text = catalog.i18nc("@text", "Snapshot %s restored : %d keys changed") % (date, transaction.changedCount())
+        if not same_profile :
+            text += "\n" + catalog.i18nc("@text", "The custom profile of the snapshot is not active : only the user changes are restored")
+        if not_restored :
+            text += "\n" + catalog.i18nc("@text", "%d values not restored (extruder or setting not available)") % not_restored
+        Message(text, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Local HTTP server for the scripts & the MES of the workshop
+    def toggleProfileServer(self) -> None:
+        if self._server is not None and self._server.isRunning() :
+            self._stopProfileServer()
+            self._preferences.setValue("import_export_tools/server_enabled", False)
+            Message().hide()
+            Message(catalog.i18nc("@text", "Profile server stopped"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+        if self._startProfileServer() :
+            self._preferences.setValue("import_export_tools/server_enabled", True)
+            Message().hide()
+            Message(catalog.i18nc("@text", "Profile server listening on http://127.0.0.1:%d") % int(self._preferences.getValue("import_export_tools/server_port")), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    def _startProfileServer(self) -> bool:
+        if self._server is None :
+            self._server = ProfileServer(int(self._preferences.getValue("import_export_tools/server_port")), self._service)
+        try:
+            self._server.start()
+        except OSError:
+            Logger.logException("e", "Could not start the profile server")
+            self._server = None
+            return False
+        return True
+
+    def _stopProfileServer(self) -> None:
+        if self._server is not None :
+            self._server.stop()
+
+    # Write a table in a file format, in memory (called from the server threads)
+    def _formatTable(self, table: ProfileTable, profiles: List[Tuple[str, str]], file_format: str) -> Tuple[bytes, str]:
+        if file_format == "json" :
+            return json.dumps(table.toDict()).encode("utf-8"), "application/json"
+        if file_format == "curaprofile" :
+            if not profiles :
+                raise ValueError("No custom profile")
+            data = io.BytesIO()
+            writeCuraProfile(data, profiles)
+            return data.getvalue(), "application/zip"
+        if file_format == "csv" :
+            text = io.StringIO(newline='')
+            self._writeCsvTable(csv.writer(text, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL), table)
+            return text.getvalue().encode("utf-8"), "text/csv"
+        raise ValueError("Unknown format %s" % file_format)
+
+    # Read a CSV, JSON or Cura Profile content as a table
+    # With the setting index read on the main thread, only plain data is used : it can run in the server threads
+    # The merge rules are applied like for the files, rules : the compiled rules read on the main thread
+    def _parseTableData(self, data: bytes, content_type: str, index: Optional[SettingIndex] = None, rules: Optional[TransformRules] = None) -> ProfileTable:
+        if index is None :
+            index = SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+        if rules is None :
+            rules = self._getTransformRules()
+        table = self._parseTableContent(data, content_type, index)
+        if not rules.isEmpty() :
+            rules.apply(table)
+        return table
+
+    def _parseTableContent(self, data: bytes, content_type: str, index: SettingIndex) -> ProfileTable:
+        if content_type == "application/zip" :
+            return self._profileChanges([sections for member_name, sections in readCuraProfile(io.BytesIO(data))], index)
+        if content_type == "application/json" :
+            content = json.loads(data.decode("utf-8"))
+            table = ProfileTable()
+            for kkey, kvalue in content.get("general", {}).items():
+                table.addGeneral(kkey, str(kvalue))
+            for setting in content.get("settings", []):
+                kkey = setting["key"]
+                if not index.hasKey(kkey) :
+                    table.ignored.add(kkey)
+                    continue
+                table.append(self._typedChange(index, int(setting.get("extruder", 1)) - 1, kkey, str(setting["value"])))
+            return table
+        return self._parseCsvStream(io.StringIO(data.decode("utf-8-sig"), newline=''), "HTTP request", index)
+
+    # Remove from the quality_changes the values identical to the values of the quality, material & definition
+    def pruneRedundantOverrides(self) -> None:
+        Message().hide()
+        try:
+            results = findAllRedundantOverrides(CuraApplication.getInstance().getGlobalContainerStack())
+        except:
+            Logger.logException("e", "Could not analyse the custom profile")
+            return
+        redundant_count = sum(len(result.keys) for result in results)
+        key_count = sum(result.key_count for result in results)
+        if not redundant_count :
+            Message(catalog.i18nc("@text", "No redundant value in the custom profile (%d values)") % key_count, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        size = sum(result.size for result in results)
+        removed_size = sum(result.removed_size for result in results)
+        keys = sorted({key for result in results for key in result.keys})
+        text = catalog.i18nc("@text", "%d of %d values of the custom profile don't change the settings.") % (redundant_count, key_count)
+        text += "\n" + catalog.i18nc("@text", "Profile size : %d bytes, %d bytes after the cleaning (-%d %%)") % (size, size - removed_size, round(100 * removed_size / max(size, 1)))
+        text += "\n\n" + ", ".join(keys[:30]) + (" ..." if len(keys) > 30 else "")
+        text += "\n\n" + catalog.i18nc("@text", "Remove these values ?")
+        if QMessageBox.question(None, catalog.i18nc("@title:window", "Clean the Custom Profile"), text) != (QMessageBox.Yes if VERSION_QT5 else QMessageBox.StandardButton.Yes) :
+            return
+
+        transaction = ProfileTransaction()
+        for result in results:
+            for key in result.keys:
+                transaction.removeValue(result.container, key)
+        if not transaction.commit() :
+            Message(catalog.i18nc("@text", "Cleaning failed : the profile has been restored"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+        self._last_transaction = transaction
+        Message(catalog.i18nc("@text", "%d values removed from the custom profile") % transaction.changedCount(), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+
+    # Undo the last CSV merge
+    def undoLastImport(self) -> None:
+        Message().hide()
+        if self._last_transaction is None or not self._last_transaction.isCommitted() :
+            Message(catalog.i18nc("@text", "Nothing to undo !"), title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
+            return
+
+        changed_count = self._last_transaction.changedCount()
+        self._last_transaction.rollback()
+        if self._last_created_targets is not None and self._last_created_targets[0] is self._last_transaction :
+            self._discardImportTargets(*self._last_created_targets[1:])
+            CuraApplication.getInstance().saveSettings()
+        self._last_transaction = None
+        self._last_created_targets = None
+        Message(catalog.i18nc("@text", "Undo : %d keys restored") % changed_count, title = catalog.i18nc("@title", "Import Export CSV Profiles Tools")).show()
 
     def changeValue(self, lblkey) -> bool:
         
@@ -0,0 +1,127 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from UM.Application import Application
+from UM.Logger import Logger
+from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
+from UM.Settings.SettingInstance import SettingInstance
+from UM.Signal import CompressTechnique, postponeSignals
+
+
+class ObjectSettings:
+    """Per-object overrides of a scene node : the values of the top container of its setting stack."""
+
+    __slots__ = ("name", "index", "extruder", "values")
+
+    def __init__(self, name: str, index: int, extruder: Optional[str]) -> None:
+        self.name = name
+        # Position of the node in the scene, used when the name is not unique
+        self.index = index
+        # Extruder position, None if the node uses the default extruder
+        self.extruder = extruder
+        self.values = {}  # type: Dict[str, Any]
+
+
+def sceneObjects() -> List[Any]:
+    """The printable objects, modifiers and support blockers of the scene, in a stable order."""
+    root = Application.getInstance().getController().getScene().getRoot()
+    return [node for node in DepthFirstIterator(root) if node.callDecoration("isSliceable")]
+
+
+def collectObjectSettings() -> List[ObjectSettings]:
+    """Read the override container of every scene object, one pass per node."""
+    objects = []  # type: List[ObjectSettings]
+    for index, node in enumerate(sceneObjects()):
+        stack = node.callDecoration("getStack")
+        if stack is None:
+            continue
+        settings = stack.getTop()
+        keys = settings.getAllKeys()
+        extruder = node.callDecoration("getActiveExtruderPosition")
+        if not keys and extruder is None:
+            continue
+        object_settings = ObjectSettings(node.getName(), index, extruder)
+        for key in keys:
+            # Formulas are kept as =expression
+            object_settings.values[key] = settings.getProperty(key, "value")
+        objects.append(object_settings)
+    return objects
+
+
+def matchObjects(objects: List[ObjectSettings]) -> Tuple[List[Tuple[Any, ObjectSettings]], List[ObjectSettings]]:
+    """Find the scene node of every object, by its name if it is unique in the scene, else by its index.
+
+    :return: The (node, settings) found and the settings without node.
+    """
+    nodes = sceneObjects()
+    by_name = {}  # type: Dict[str, Any]
+    duplicates = set()
+    for node in nodes:
+        name = node.getName()
+        if name in by_name:
+            duplicates.add(name)
+        by_name[name] = node
+
+    matched = []  # type: List[Tuple[Any, ObjectSettings]]
+    missing = []  # type: List[ObjectSettings]
+    for object_settings in objects:
+        node = None
+        if object_settings.name in by_name and object_settings.name not in duplicates:
+            node = by_name[object_settings.name]
+        elif 0 <= object_settings.index < len(nodes) and (not object_settings.name or nodes[object_settings.index].getName() == object_settings.name):
+            node = nodes[object_settings.index]
+        if node is None or node.callDecoration("getStack") is None:
+            missing.append(object_settings)
+        else:
+            matched.append((node, object_settings))
+    return matched, missing
+
+
+def applyObjectSettings(matched: List[Tuple[Any, ObjectSettings]]) -> Tuple[int, Set[str]]:
+    """Write the overrides of all the objects, as one batch of setting changes.
+
+    The property changes of the stacks are postponed until all the nodes are updated, then
+    emitted once per key, so the scene and the slicing are only updated once. The settings
+    that are not settable per mesh are skipped, as in the per model settings panel.
+
+    :return: The number of values written and the keys skipped.
+    """
+    global_stack = Application.getInstance().getGlobalContainerStack()
+    extruders = {extruder.getMetaDataEntry("position"): extruder.getId() for extruder in global_stack.extruderList}
+    signals = []
+    for node, object_settings in matched:
+        stack = node.callDecoration("getStack")
+        signals.append(stack.propertyChanged)
+        signals.append(stack.getTop().propertyChanged)
+
+    count = 0
+    rejected = set()  # type: Set[str]
+    with postponeSignals(*signals, compress = CompressTechnique.CompressPerParameterValue):
+        for node, object_settings in matched:
+            settings = node.callDecoration("getStack").getTop()
+            if object_settings.extruder is not None and object_settings.extruder in extruders:
+                node.callDecoration("setActiveExtruder", extruders[object_settings.extruder])
+            for key, value in object_settings.values.items():
+                if not global_stack.getProperty(key, "settable_per_mesh"):
+                    rejected.add(key)
+                    continue
+                if str(settings.getProperty(key, "value")) == str(value):
+                    continue
+                if not settings.hasProperty(key, "value"):
+                    # Same creation as the per model settings panel of Cura
+                    definition = global_stack.getSettingDefinition(key)
+                    if definition is None:
+                        Logger.log("w", "Unknown per object setting %s", key)
+                        continue
+                    instance = SettingInstance(definition, settings)
+                    instance.setProperty("value", value)
+                    instance.resetState()
+                    settings.addInstance(instance)
+                else:
+                    settings.setProperty(key, "value", value)
+                count += 1
+    if rejected:
+        Logger.log("w", "Settings not settable per object : %s", sorted(rejected))
+    return count, rejected
@@ -0,0 +1,81 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from typing import Any, List
+
+from UM.Logger import Logger
+from UM.Settings.PropertyEvaluationContext import PropertyEvaluationContext
+from UM.Settings.SettingFunction import SettingFunction
+
+
+class RedundantOverrides:
+    """The overrides of a quality_changes container that don't change the value of its stack."""
+
+    __slots__ = ("stack", "container", "keys", "key_count", "size", "removed_size")
+
+    def __init__(self, stack, container) -> None:
+        self.stack = stack
+        self.container = container
+        self.keys = []  # type: List[str]
+        self.key_count = 0
+        # Size of the serialized container and of the lines of the redundant keys
+        self.size = 0
+        self.removed_size = 0
+
+
+def _sameValue(first: Any, second: Any) -> bool:
+    if isinstance(first, (int, float)) and isinstance(second, (int, float)) and not isinstance(first, bool):
+        return abs(first - second) <= 1e-9 * max(1.0, abs(first), abs(second))
+    return first == second
+
+
+def findRedundantOverrides(stack) -> RedundantOverrides:
+    """Compare every override of the quality_changes of a stack with the value of the stack without it.
+
+    The value below the quality_changes is read with a context starting at the next container
+    of the stack : nothing is modified to evaluate the stack without the override. A formula found
+    below is evaluated from the quality_changes, like the value it is compared with : the settings
+    it depends on keep the other overrides of the profile, but not the unsaved user changes. A
+    formula is only redundant if the container below defines the same formula.
+    """
+    container = stack.qualityChanges
+    result = RedundantOverrides(stack, container)
+    if container.getId() == "empty_quality_changes":
+        return result
+    position = stack.getContainerIndex(container)
+
+    with_override = PropertyEvaluationContext(stack)
+    with_override.context["evaluate_from_container_index"] = position
+    without_override = PropertyEvaluationContext(stack)
+    without_override.context["evaluate_from_container_index"] = position + 1
+
+    keys = container.getAllKeys()
+    result.key_count = len(keys)
+    result.size = len(container.serialize())
+    for key in sorted(keys):
+        try:
+            raw = container.getProperty(key, "value")
+            below_raw = stack.getRawProperty(key, "value", context = without_override)
+            if isinstance(raw, SettingFunction):
+                if str(raw) != str(below_raw):
+                    continue
+            else:
+                if isinstance(below_raw, SettingFunction):
+                    # Not without_override : it would also skip the other overrides used by the formula
+                    below_value = below_raw(stack, with_override)
+                else:
+                    below_value = stack.getProperty(key, "value", without_override)
+                if not _sameValue(stack.getProperty(key, "value", with_override), below_value):
+                    continue
+        except Exception:
+            Logger.logException("w", "Could not evaluate the override %s of %s", key, container.getId())
+            continue
+        result.keys.append(key)
+        # Line of the key in the serialized container
+        result.removed_size += len("%s = %s\n" % (key, raw))
+    return result
+
+
+def findAllRedundantOverrides(global_stack) -> List[RedundantOverrides]:
+    """The redundant overrides of the custom profile of a printer, global then extruders."""
+    return [findRedundantOverrides(stack) for stack in [global_stack] + list(global_stack.extruderList)]
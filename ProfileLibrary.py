@@ -0,0 +1,132 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import re
+import sqlite3
+
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from UM.Logger import Logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    name TEXT,
+    machine TEXT,
+    mtime REAL,
+    added TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    extruder INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS settings_key_value ON settings(key, value);
+CREATE INDEX IF NOT EXISTS settings_key_number ON settings(key, number);
+CREATE INDEX IF NOT EXISTS settings_profile ON settings(profile_id);
+CREATE INDEX IF NOT EXISTS profiles_machine ON profiles(machine);
+"""
+
+# key operator value, conditions separated by "and"
+_CONDITION_PATTERN = re.compile(r"^\s*([A-Za-z0-9_]+)\s*(<=|>=|!=|=|<|>|like)\s*(.*?)\s*$", re.IGNORECASE)
+_CONDITION_SEPARATOR = re.compile(r"\s+and\s+", re.IGNORECASE)
+
+# One result : (profile id, profile name, machine, source file, extruder, value)
+QueryResult = Tuple[int, str, str, str, int, str]
+
+
+def _toNumber(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parseQuery(query: str) -> List[Tuple[str, str, str]]:
+    """Split a query like "support_angle > 60 and quality_type = normal" in (key, operator, value).
+
+    :raise ValueError: If a condition can't be parsed.
+    """
+    conditions = []
+    for text in _CONDITION_SEPARATOR.split(query.strip()):
+        match = _CONDITION_PATTERN.match(text)
+        if not match:
+            raise ValueError("Invalid condition : %s" % text)
+        key, operator, value = match.groups()
+        conditions.append((key, operator.lower(), value.strip("\"'")))
+    return conditions
+
+
+class ProfileLibrary:
+    """Local SQLite library of the exported and ingested profiles.
+
+    Every setting of a profile is stored as one indexed (profile, extruder, key, value) row,
+    with the numerical value in a separate column for the range queries.
+    """
+
+    def __init__(self, database_path: str) -> None:
+        self._database_path = database_path
+        self._connection = None  # type: Optional[sqlite3.Connection]
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._database_path)
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def isUpToDate(self, source: str, mtime: float) -> bool:
+        row = self._connect().execute("SELECT mtime FROM profiles WHERE source = ?", (source, )).fetchone()
+        return row is not None and row[0] == mtime
+
+    def addProfile(self, source: str, name: str, machine: str, mtime: float, rows: Iterable[Tuple[int, str, Any]]) -> int:
+        """Add or replace the profile read from a file.
+
+        :param rows: The (extruder, key, value) of the profile.
+        :return: The id of the profile in the library.
+        """
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM profiles WHERE source = ?", (source, ))
+            cursor = connection.execute("INSERT INTO profiles (source, name, machine, mtime, added) VALUES (?, ?, ?, ?, ?)",
+                                        (source, name, machine, mtime, datetime.now().isoformat(timespec = "seconds")))
+            profile_id = cursor.lastrowid
+            connection.executemany("INSERT INTO settings (profile_id, extruder, key, value, number) VALUES (?, ?, ?, ?, ?)",
+                                   ((profile_id, extruder, key, str(value), _toNumber(value)) for extruder, key, value in rows))
+        Logger.log("d", "Profile library : %s added as profile %d", source, profile_id)
+        return profile_id
+
+    def query(self, query: str) -> List[QueryResult]:
+        """Find the settings matching the first condition, in the profiles matching all the conditions."""
+        conditions = parseQuery(query)
+        sql = "SELECT p.id, p.name, p.machine, p.source, s.extruder, s.value FROM settings s JOIN profiles p ON p.id = s.profile_id WHERE "
+        parameters = []  # type: List[Any]
+        clauses = []
+        for position, (key, operator, value) in enumerate(conditions):
+            number = _toNumber(value)
+            if operator == "like":
+                column, value = "value", value.replace("*", "%")
+            elif number is not None:
+                column, value = "number", number
+            else:
+                column = "value"
+            if position == 0:
+                clauses.append("s.key = ? AND s.%s %s ?" % (column, operator))
+            else:
+                clauses.append("p.id IN (SELECT profile_id FROM settings WHERE key = ? AND %s %s ?)" % (column, operator))
+            parameters.extend((key, value))
+        sql += " AND ".join(clauses) + " ORDER BY p.name, s.extruder"
+        return self._connect().execute(sql, parameters).fetchall()
+
+    def profileRows(self, profile_id: int) -> List[Tuple[int, str, str]]:
+        """The (extruder, key, value) rows of a profile of the library."""
+        return self._connect().execute("SELECT extruder, key, value FROM settings WHERE profile_id = ? ORDER BY extruder, rowid", (profile_id, )).fetchall()
@@ -0,0 +1,73 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import sys
+
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+class SettingRow:
+    """One setting of a profile, as read from or written to a file.
+
+    The section, key and type strings are interned : they are shared by all the profiles
+    loaded together.
+    """
+
+    __slots__ = ("section", "extruder", "key", "type", "label", "value", "source")
+
+    def __init__(self, section: str, extruder: int, key: str, ktype: str, label: str, value: Any, source: str = "") -> None:
+        self.section = sys.intern(section)
+        # Extruder index, 0 for the first extruder
+        self.extruder = extruder
+        self.key = sys.intern(key)
+        self.type = sys.intern(ktype)
+        self.label = sys.intern(label)
+        self.value = value
+        # Container of the value (global:user, extruder:quality_changes ...), empty if unknown
+        self.source = sys.intern(source)
+
+    def __repr__(self) -> str:
+        return "SettingRow(%s, %d, %s, %s, %r)" % (self.section, self.extruder, self.key, self.type, self.value)
+
+
+class ProfileTable:
+    """The general informations (Date, Profile, Machine ...) and the setting rows of a profile."""
+
+    __slots__ = ("general", "rows", "ignored", "conflicts")
+
+    def __init__(self) -> None:
+        self.general = []  # type: List[SettingRow]
+        self.rows = []  # type: List[SettingRow]
+        # Keys of the file removed from Cura or unknown for the printer, not imported
+        self.ignored = set()  # type: Set[str]
+        # Keys given by several extruders of the file for the same extruder by the merge rules
+        self.conflicts = set()  # type: Set[str]
+
+    def addGeneral(self, key: str, value: str, ktype: str = "str", label: Optional[str] = None) -> None:
+        self.general.append(SettingRow("general", -1, key, ktype, label if label is not None else key, value))
+
+    def getGeneral(self, key: str, default: str = "") -> str:
+        for row in self.general:
+            if row.key == key:
+                return row.value
+        return default
+
+    def append(self, row: SettingRow) -> None:
+        self.rows.append(row)
+
+    def toDict(self) -> Dict[str, Any]:
+        """The table as JSON data, with the extruder numbers of the CSV files (1 for the first extruder)."""
+        return {
+            "general": {row.key: str(row.value) for row in self.general},
+            "settings": [{"section": row.section, "extruder": row.extruder + 1, "key": row.key, "type": row.type, "label": row.label, "value": str(row.value)} for row in self.rows]
+        }
+
+    def index(self) -> Dict[Tuple[int, str], SettingRow]:
+        """The rows by (extruder, key)."""
+        return {(row.extruder, row.key): row for row in self.rows}
+
+    def __iter__(self) -> Iterator[SettingRow]:
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
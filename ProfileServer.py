@@ -0,0 +1,164 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from UM.Application import Application
+from UM.Logger import Logger
+
+from .ProfileService import ProfileService
+
+# Larger requests are rejected
+_MAX_BODY_SIZE = 16 * 1024 * 1024
+# Content types accepted for the diff & import requests
+_BODY_TYPES = ("text/csv", "application/json", "application/zip")
+
+
+class ProfileServer:
+    """Local HTTP / JSON access to the export, diff and import of the plugin.
+
+    GET  /export?format=csv|json|curaprofile : the current settings of the active printer
+    POST /diff   (CSV, JSON or Cura Profile body) : the values different from the active printer
+    POST /import?name=... (same bodies) : merge the values in the active printer
+
+    The server only listens on 127.0.0.1. It is a thin layer over the profile service : every
+    request is handled in its own thread, where the files are parsed and written, while the
+    calls accessing the Cura stacks are queued on the main thread, one request at a time.
+    """
+
+    def __init__(self, port: int, service: ProfileService, timeout: float = 60.0) -> None:
+        self._port = port
+        self._service = service
+        self._timeout = timeout
+        self._server = None  # type: Optional[ThreadingHTTPServer]
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def isRunning(self) -> bool:
+        return self._server is not None
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        server = ThreadingHTTPServer(("127.0.0.1", self._port), _RequestHandler)
+        server.daemon_threads = True
+        server.profile_server = self  # type: ignore
+        self._server = server
+        self._thread = threading.Thread(target = server.serve_forever, name = "ProfileServer", daemon = True)
+        self._thread.start()
+        Logger.log("i", "Profile server listening on 127.0.0.1:%d", self._port)
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        Logger.log("i", "Profile server stopped")
+
+    def callOnMainThread(self, function: Callable[[], Any]) -> Any:
+        """Queue a call on the main thread of Cura and wait for its result.
+
+        A call still queued at the timeout is abandoned : it is never run, the client got an error.
+        A call already started is waited for, its changes are done.
+        """
+        done = threading.Event()
+        lock = threading.Lock()
+        result = {}  # type: Dict[str, Any]
+        # "started" once run by the main thread, "abandoned" once the request has timed out
+        state = {"started": False, "abandoned": False}
+
+        def run() -> None:
+            with lock:
+                if state["abandoned"]:
+                    return
+                state["started"] = True
+            try:
+                result["value"] = function()
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        Application.getInstance().callLater(run)
+        if not done.wait(self._timeout):
+            with lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    raise TimeoutError("Cura did not answer")
+            done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes, content_type: str) -> Tuple[int, bytes, str]:
+        """Answer a request : (status, data, content type)."""
+        if method == "GET" and path == "/export":
+            file_format = query.get("format", ["csv"])[0]
+            table, profiles = self.callOnMainThread(lambda: (self._service.exportTable(), self._service.exportProfiles()))
+            return (200, ) + self._service.formatTable(table, profiles, file_format)
+
+        if method == "POST" and path in ("/diff", "/import"):
+            # Only the body is read in this thread, with the settings of the printer & the rules read on the main thread
+            index, rules = self.callOnMainThread(lambda: (self._service.settingIndex(), self._service.transformRules()))
+            table = self._service.parseData(body, content_type, index, rules)
+            if path == "/diff":
+                result = {"differences": self.callOnMainThread(lambda: self._service.diff(table))}  # type: Dict[str, Any]
+            else:
+                name = query.get("name", [table.getGeneral("Profile") or "HTTP"])[0]
+                result = self.callOnMainThread(lambda: self._service.importTable(table, name, snapshot = True, notify = True))
+            result["ignored"] = sorted(table.ignored)
+            result["conflicts"] = sorted(table.conflicts)
+            return 200, json.dumps(result).encode("utf-8"), "application/json"
+
+        return 404, json.dumps({"error": "Unknown request %s %s" % (method, path)}).encode("utf-8"), "application/json"
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self._answer("GET")
+
+    def do_POST(self) -> None:
+        self._answer("POST")
+
+    def _answer(self, method: str) -> None:
+        # Only local clients : rejects the pages of a browser using a rebound host name
+        host = self.headers.get("Host", "").rsplit(":", 1)[0]
+        if host not in ("127.0.0.1", "localhost"):
+            self._send(403, json.dumps({"error": "Forbidden host"}).encode("utf-8"), "application/json")
+            return
+
+        url = urlparse(self.path)
+        body = b""
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if method == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            if length > _MAX_BODY_SIZE:
+                self._send(413, json.dumps({"error": "Request too large"}).encode("utf-8"), "application/json")
+                return
+            if content_type not in _BODY_TYPES:
+                self._send(415, json.dumps({"error": "Content type must be one of %s" % ", ".join(_BODY_TYPES)}).encode("utf-8"), "application/json")
+                return
+            body = self.rfile.read(length)
+
+        try:
+            status, data, data_type = self.server.profile_server.handle(method, url.path, parse_qs(url.query), body, content_type)  # type: ignore
+        except Exception as e:
+            Logger.logException("e", "Profile server : %s %s failed", method, self.path)
+            status, data, data_type = 500, json.dumps({"error": str(e)}).encode("utf-8"), "application/json"
+        self._send(status, data, data_type)
+
+    def _send(self, status: int, data: bytes, data_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", data_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        Logger.log("d", "Profile server : " + format, *args)
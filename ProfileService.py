@@ -0,0 +1,99 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from cura.CuraApplication import CuraApplication
+
+from .ProfileModel import ProfileTable
+from .SettingSelector import SettingSelector
+from .SettingValidation import SettingIndex
+from .TransformRules import TransformRules
+
+
+class ProfileService:
+    """Export, diff and import of the active printer for the other plugins and the scripts.
+
+    The tables are exchanged in memory : no file and no dialog. Get it with
+    PluginRegistry.getInstance().getPluginObject("ImportExportProfiles").getService().
+
+    exportTable, exportProfiles, diff, importTable, settingIndex and transformRules read or write
+    the Cura stacks : they must be called on the main thread. formatTable only handles data and can
+    be called from any thread, parseData too when it is given the index and the rules read on the
+    main thread.
+    """
+
+    def __init__(self, extension) -> None:
+        self._extension = extension
+        # Compiled selectors of the patterns already used
+        self._selectors = {}  # type: Dict[str, SettingSelector]
+
+    def exportTable(self, formulas: bool = False, patterns: Optional[str] = None, provenance: bool = False) -> ProfileTable:
+        """The current settings of the active printer.
+
+        :param formulas: Export the formulas as =expression instead of their value, and only the
+            values different from the definition.
+        :param patterns: Only the sections & keys matching these patterns (speed_*, material ...).
+        :param provenance: Only the values above the definition, with their source container.
+        :return: The values typed like the parsed files : bool, int, float, str, or a SettingFunction
+            for the formulas. The table can be given as is to importTable and diff.
+        """
+        if provenance:
+            table = self._extension._collectProvenance()
+        else:
+            selector = None
+            if patterns:
+                if patterns not in self._selectors:
+                    self._selectors[patterns] = SettingSelector(patterns)
+                selector = self._selectors[patterns]
+            table = self._extension._collectSettings(formulas, selector)
+        for row in table.rows:
+            try:
+                row.value = self._extension._typedValue(row.type, row.value)
+            except ValueError:
+                # Kept as string, like the files
+                pass
+        return table
+
+    def exportProfiles(self) -> List[Tuple[str, str]]:
+        """The (container id, serialized container) of the active custom profile."""
+        return [(container.getId(), container.serialize()) for container in self._extension._qualityChangesContainers()]
+
+    def diff(self, table: ProfileTable) -> List[Dict[str, Any]]:
+        """The values of a table different from the active printer : extruder, key, current & value."""
+        return self._extension._diffChanges(table.rows)
+
+    def importTable(self, table: ProfileTable, name: str = "", snapshot: bool = False, notify: bool = False) -> Dict[str, Any]:
+        """Validate and merge a table in the active printer, in the merge target of the preferences.
+
+        The merge can be undone by "Undo Last Merge".
+
+        :param snapshot: Save the current settings in the snapshot history before the merge.
+        :param notify: Display the result message in Cura.
+        :return: The status, the number of changed keys, the errors and the warnings.
+        """
+        return self._extension._mergeChanges(table.rows, name or table.getGeneral("Profile"), snapshot = snapshot, notify = notify)
+
+    def settingIndex(self) -> SettingIndex:
+        """The types, labels and options of the settings of the active printer."""
+        return SettingIndex.forStack(CuraApplication.getInstance().getGlobalContainerStack())
+
+    def transformRules(self) -> TransformRules:
+        """The merge rules of the preferences, compiled."""
+        return self._extension._getTransformRules()
+
+    def parseData(self, data: bytes, content_type: str, index: Optional[SettingIndex] = None, rules: Optional[TransformRules] = None) -> ProfileTable:
+        """Read a CSV (text/csv), JSON (application/json) or Cura Profile (application/zip) content.
+
+        The merge rules are applied like for the merged files. The settings given by several
+        extruders for the same extruder by the rules are in the conflicts of the table.
+
+        :param index: The result of settingIndex, read on the main thread.
+        :param rules: The result of transformRules, read on the main thread. Without index or
+            rules, they are read here : the call must then be made on the main thread.
+        """
+        return self._extension._parseTableData(data, content_type, index, rules)
+
+    def formatTable(self, table: ProfileTable, profiles: List[Tuple[str, str]], file_format: str) -> Tuple[bytes, str]:
+        """Write a table as csv, json or curaprofile : the data and its content type."""
+        return self._extension._formatTable(table, profiles, file_format)
@@ -0,0 +1,92 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from typing import Any, Dict, List, Tuple
+
+from UM.Logger import Logger
+from UM.Signal import CompressTechnique, postponeSignals
+
+# Staged value of a key to remove from its container
+_REMOVED = object()
+
+
+class ProfileTransaction:
+    """Group the setting changes of one import so they are applied (or undone) as a whole.
+
+    Changes are only staged by setValue and removeValue. Commit saves the current state of the touched
+    keys, then writes the new values. Rollback restores the saved keys, so its cost only
+    depends on the number of changed keys, not on the size of the containers.
+    """
+
+    def __init__(self) -> None:
+        self._pending = []  # type: List[Tuple[Any, str, Any]]
+        # (container id, key) -> (container, had_value, old_value)
+        self._snapshot = {}  # type: Dict[Tuple[str, str], Tuple[Any, bool, Any]]
+        self._committed = False
+
+    def setValue(self, container, key: str, value: Any) -> None:
+        self._pending.append((container, key, value))
+
+    def removeValue(self, container, key: str) -> None:
+        self._pending.append((container, key, _REMOVED))
+
+    def hasChanges(self) -> bool:
+        return len(self._pending) > 0
+
+    def isCommitted(self) -> bool:
+        return self._committed
+
+    def changedCount(self) -> int:
+        return len(self._snapshot)
+
+    def commit(self) -> bool:
+        """Apply every staged change. If one of them fails, the changes already done are rolled back.
+
+        :return: True if all the changes have been applied.
+        """
+        removed_from = {}
+        # The property changes are sent once per key, after all the values are written
+        signals = list({container.getId(): container.propertyChanged for container, key, value in self._pending}.values())
+        try:
+            with postponeSignals(*signals, compress = CompressTechnique.CompressPerParameterValue):
+                for container, key, value in self._pending:
+                    snapshot_key = (container.getId(), key)
+                    if snapshot_key not in self._snapshot:
+                        had_value = container.hasProperty(key, "value")
+                        old_value = container.getProperty(key, "value") if had_value else None
+                        self._snapshot[snapshot_key] = (container, had_value, old_value)
+                    if value is _REMOVED:
+                        container.removeInstance(key, postpone_emit = True)
+                        removed_from[container.getId()] = container
+                    else:
+                        container.setProperty(key, "value", value)
+                for container in removed_from.values():
+                    container.sendPostponedEmits()
+        except Exception:
+            Logger.logException("e", "Could not apply the settings, rolling back the changes")
+            self.rollback()
+            return False
+
+        self._pending = []
+        self._committed = True
+        return True
+
+    def rollback(self) -> None:
+        """Restore the touched keys to the state they had before the commit."""
+        containers = {}
+        for (container_id, key), (container, had_value, old_value) in reversed(list(self._snapshot.items())):
+            try:
+                if had_value:
+                    container.setProperty(key, "value", old_value)
+                else:
+                    container.removeInstance(key, postpone_emit = True)
+            except Exception:
+                Logger.logException("e", "Could not restore the setting %s", key)
+            containers[container_id] = container
+
+        for container in containers.values():
+            container.sendPostponedEmits()
+
+        self._snapshot = {}
+        self._pending = []
+        self._committed = False
@@ -0,0 +1,112 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import configparser
+import io
+import urllib.parse
+import zipfile
+
+from typing import Dict, List, Optional
+
+# Index of the containers in the [containers] section of a stack file
+_USER_CHANGES = "0"
+_QUALITY_CHANGES = "1"
+_QUALITY = "3"
+_DEFINITION = "7"
+
+_PROJECT_FOLDER = "Cura/"
+
+
+def _readMember(archive: zipfile.ZipFile, member_name: str) -> configparser.ConfigParser:
+    parser = configparser.ConfigParser(interpolation = None)
+    with archive.open(member_name) as member:
+        parser.read_file(io.TextIOWrapper(member, encoding = "utf-8"))
+    return parser
+
+
+def _readContainer(archive: zipfile.ZipFile, containers: Dict[str, str], container_id: Optional[str]) -> Optional[configparser.ConfigParser]:
+    if not container_id or container_id not in containers:
+        return None
+    return _readMember(archive, containers[container_id])
+
+
+def _stackProfile(archive: zipfile.ZipFile, containers: Dict[str, str], stack: configparser.ConfigParser, position: Optional[str], definition: str) -> str:
+    """Serialized quality_changes of a stack, with the user changes of the project merged in."""
+    stack_containers = stack["containers"] if stack.has_section("containers") else {}
+    user_changes = _readContainer(archive, containers, stack_containers.get(_USER_CHANGES))
+    profile = _readContainer(archive, containers, stack_containers.get(_QUALITY_CHANGES))
+
+    if profile is None:
+        # No custom profile in the project, only the user changes
+        profile = configparser.ConfigParser(interpolation = None)
+        profile["general"] = {
+            "version": "4",
+            "name": stack.get("general", "name", fallback = "Project"),
+            "definition": definition
+        }
+        profile["metadata"] = {"type": "quality_changes"}
+        quality = _readContainer(archive, containers, stack_containers.get(_QUALITY))
+        if quality is not None and quality.has_option("metadata", "quality_type"):
+            profile["metadata"]["quality_type"] = quality["metadata"]["quality_type"]
+        if user_changes is not None and user_changes.has_option("metadata", "setting_version"):
+            profile["metadata"]["setting_version"] = user_changes["metadata"]["setting_version"]
+        profile["values"] = {}
+
+    if not profile.has_section("values"):
+        profile.add_section("values")
+    if user_changes is not None and user_changes.has_section("values"):
+        for key, value in user_changes["values"].items():
+            profile["values"][key] = value
+
+    if not profile.has_section("metadata"):
+        profile.add_section("metadata")
+    if position is None:
+        profile.remove_option("metadata", "position")
+    else:
+        profile["metadata"]["position"] = position
+
+    output = io.StringIO()
+    profile.write(output)
+    return output.getvalue()
+
+
+def readProjectProfile(file_name: str) -> List[str]:
+    """Read the profile of a 3MF project without loading the project.
+
+    Only the names of the zip members are listed, then the stack files and the containers
+    they reference are read. The mesh members are never decompressed.
+
+    :param file_name: The full path of the 3MF file.
+    :return: The serialized global profile followed by the extruder profiles, empty if
+        the file isn't a Cura project.
+    """
+    with zipfile.ZipFile(file_name) as archive:
+        containers = {}  # type: Dict[str, str]
+        global_stacks = []  # type: List[str]
+        extruder_stacks = []  # type: List[str]
+        for member_name in archive.namelist():
+            if not member_name.startswith(_PROJECT_FOLDER):
+                continue
+            base_name = member_name[len(_PROJECT_FOLDER):]
+            if base_name.endswith(".inst.cfg"):
+                containers[urllib.parse.unquote_plus(base_name[:-len(".inst.cfg")])] = member_name
+            elif base_name.endswith(".global.cfg"):
+                global_stacks.append(member_name)
+            elif base_name.endswith(".extruder.cfg"):
+                extruder_stacks.append(member_name)
+
+        if not global_stacks:
+            return []
+
+        global_stack = _readMember(archive, global_stacks[0])
+        # The quality_changes of the extruders are also defined for the machine definition
+        definition = global_stack.get("containers", _DEFINITION, fallback = "fdmprinter")
+        profile_strings = [_stackProfile(archive, containers, global_stack, None, definition)]
+
+        extruders = {}  # type: Dict[int, str]
+        for member_name in extruder_stacks:
+            stack = _readMember(archive, member_name)
+            position = stack.get("metadata", "position", fallback = "0")
+            extruders[int(position)] = _stackProfile(archive, containers, stack, position, definition)
+        profile_strings.extend(extruders[position] for position in sorted(extruders))
+        return profile_strings
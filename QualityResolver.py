@@ -0,0 +1,113 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cura.Machines.ContainerTree import ContainerTree
+
+from UM.Logger import Logger
+from UM.Settings.ContainerRegistry import ContainerRegistry
+from UM.Settings.SettingFunction import SettingFunction
+
+
+class _QualityIndex:
+    """Available quality types of one configuration, sorted by layer height."""
+
+    def __init__(self, layer_heights: List[float], quality_types: List[str], all_layer_heights: Dict[str, float], available_types: Set[str]) -> None:
+        self.layer_heights = layer_heights
+        self.quality_types = quality_types
+        # Every available quality type, even if its layer height can't be evaluated
+        self.available_types = available_types
+        # Layer height of every quality type of the machine, available or not
+        self.all_layer_heights = all_layer_heights
+
+
+class QualityResolver:
+    """Find the available quality type closest to a quality type missing for the configuration of a printer.
+
+    The index of a configuration (machine, variants, materials) is computed once, then every
+    substitution is a binary search on the layer heights. The indexes are dropped when a
+    quality, material or variant is added or removed in the registry.
+    """
+
+    def __init__(self) -> None:
+        self._indexes = {}  # type: Dict[Tuple[Any, ...], _QualityIndex]
+        registry = ContainerRegistry.getInstance()
+        registry.containerAdded.connect(self._onContainerChanged)
+        registry.containerRemoved.connect(self._onContainerChanged)
+
+    def _onContainerChanged(self, container) -> None:
+        if self._indexes and container.getMetaDataEntry("type") in ("quality", "material", "variant"):
+            self._indexes = {}
+
+    @staticmethod
+    def _configurationKey(global_stack) -> Tuple[Any, ...]:
+        extruders = global_stack.extruderList
+        return (global_stack.definition.getId(),
+                tuple(extruder.variant.getName() for extruder in extruders),
+                tuple(extruder.material.getMetaDataEntry("base_file", "") for extruder in extruders),
+                tuple(extruder.isEnabled for extruder in extruders))
+
+    @staticmethod
+    def _layerHeight(quality_group, global_stack) -> float:
+        # Same lookup as the quality drop down menu of Cura
+        layer_height = global_stack.definition.getProperty("layer_height", "value")
+        if quality_group.node_for_global is not None:
+            container = quality_group.node_for_global.container
+            if container and container.hasProperty("layer_height", "value"):
+                layer_height = container.getProperty("layer_height", "value")
+        if isinstance(layer_height, SettingFunction):
+            layer_height = layer_height(global_stack)
+        return float(layer_height)
+
+    def _getIndex(self, global_stack) -> _QualityIndex:
+        key = self._configurationKey(global_stack)
+        if key not in self._indexes:
+            all_layer_heights = {}  # type: Dict[str, float]
+            available = []  # type: List[Tuple[float, str]]
+            available_types = set()  # type: Set[str]
+            # Same as ContainerTree.getCurrentQualityGroups, for any printer
+            variant_names, material_bases, extruder_enabled = key[1:]
+            quality_groups = ContainerTree.getInstance().machines[key[0]].getQualityGroups(list(variant_names), list(material_bases), list(extruder_enabled))
+            for quality_type, quality_group in quality_groups.items():
+                if quality_group.is_available:
+                    available_types.add(quality_type)
+                try:
+                    layer_height = self._layerHeight(quality_group, global_stack)
+                except (TypeError, ValueError):
+                    # Still available, only not a candidate for a substitution
+                    Logger.log("w", "No layer height for the quality %s", quality_type)
+                    continue
+                all_layer_heights[quality_type] = layer_height
+                if quality_group.is_available:
+                    available.append((layer_height, quality_type))
+            available.sort()
+            self._indexes[key] = _QualityIndex([height for height, quality_type in available], [quality_type for height, quality_type in available], all_layer_heights, available_types)
+            Logger.log("d", "Quality index for %s : %s", key, available)
+        return self._indexes[key]
+
+    def isAvailable(self, global_stack, quality_type: str) -> bool:
+        return quality_type in self._getIndex(global_stack).available_types
+
+    def resolve(self, global_stack, quality_type: str, layer_height: Optional[float] = None) -> Optional[str]:
+        """The available quality type with the layer height closest to the requested one.
+
+        :param layer_height: The layer height of the profile, if it defines one. Otherwise the
+            layer height of the missing quality type is used.
+        :return: The quality type to use, None if it can't be found.
+        """
+        index = self._getIndex(global_stack)
+        if quality_type in index.available_types:
+            return quality_type
+        if layer_height is None:
+            layer_height = index.all_layer_heights.get(quality_type)
+        if layer_height is None or not index.layer_heights:
+            return None
+
+        position = bisect_left(index.layer_heights, layer_height)
+        if position == len(index.layer_heights):
+            return index.quality_types[-1]
+        if position > 0 and layer_height - index.layer_heights[position - 1] <= index.layer_heights[position] - layer_height:
+            return index.quality_types[position - 1]
+        return index.quality_types[position]
@@ -0,0 +1,55 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Settings renamed (new key) or removed (None) by a Cura release
+# Same changes as the VersionUpgrade plugins of Cura
+_MIGRATIONS = [
+    ((4, 3), {
+        "support_minimal_diameter": "support_tower_maximum_supported_diameter"
+    }),
+    ((5, 0), {
+        # Arachne
+        "travel_compensate_overlapping_walls_enabled": None,
+        "travel_compensate_overlapping_walls_0_enabled": None,
+        "travel_compensate_overlapping_walls_x_enabled": None,
+        "fill_perimeter_gaps": None,
+        "filter_out_tiny_gaps": None,
+        "wall_min_flow": None,
+        "wall_min_flow_retract": None,
+        "speed_equalize_flow_max": None
+    }),
+]  # type: List[Tuple[Tuple[int, int], Dict[str, Optional[str]]]]
+
+
+def parseVersion(version: str) -> Optional[Tuple[int, int]]:
+    """Major and minor version of a Cura version string (5.2.1, 4.13.0-beta ...)."""
+    if "master" in version:
+        # Master is always a developement version.
+        return (99, 99)
+    try:
+        major, minor = version.split(".")[0:2]
+        return (int(major), int("".join(c for c in minor if c.isdigit())))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize = 32)
+def migrationMap(source: Tuple[int, int], target: Tuple[int, int]) -> Dict[str, Optional[str]]:
+    """Old key -> current key (None if removed) for a file written by the Cura version source.
+
+    The successive changes between the two versions are composed once, so the migration of a
+    row is a single dictionary lookup.
+    """
+    result = {}  # type: Dict[str, Optional[str]]
+    for version, changes in _MIGRATIONS:
+        if not source < version <= target:
+            continue
+        for old_key, new_key in list(result.items()):
+            if new_key in changes:
+                result[old_key] = changes[new_key]
+        for old_key, new_key in changes.items():
+            result.setdefault(old_key, new_key)
+    return result
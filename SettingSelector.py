@@ -0,0 +1,59 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import re
+
+from fnmatch import translate
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+
+class SettingSelector:
+    """Selection of the settings to export, from section names and key patterns.
+
+    The patterns are separated by commas or spaces : a glob (speed_*, *_temperature), a regular
+    expression prefixed by re: (re:^support_(angle|offset)$) or a section name (material,
+    machine_settings). A section selects all its settings.
+
+    The patterns are compiled in a single expression, then the keys selected in a setting tree
+    are computed once per definition. The export only walks the selected subtrees.
+    """
+
+    def __init__(self, patterns: str) -> None:
+        expressions = []  # type: List[str]
+        for pattern in re.split(r"[,\s]+", patterns.strip()):
+            if not pattern:
+                continue
+            if pattern.startswith("re:"):
+                expressions.append("(?:%s)" % pattern[3:])
+            else:
+                expressions.append(translate(pattern))
+        if not expressions:
+            raise ValueError("No pattern")
+        self._pattern = re.compile("|".join(expressions))
+        # Definition id -> (selected keys, keys to visit)
+        self._selections = {}  # type: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]]
+
+    def _matches(self, key: str) -> bool:
+        return self._pattern.match(key) is not None
+
+    def _addSetting(self, setting, selected: bool, keys: Set[str], visit: Set[str]) -> bool:
+        selected = selected or self._matches(setting.key)
+        if selected:
+            keys.add(setting.key)
+        found = selected
+        for child in setting.children:
+            found = self._addSetting(child, selected, keys, visit) or found
+        if found:
+            visit.add(setting.key)
+        return found
+
+    def select(self, definition) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """The keys selected in a machine definition, and the keys of their subtrees to visit."""
+        definition_id = definition.getId()
+        if definition_id not in self._selections:
+            keys = set()  # type: Set[str]
+            visit = set()  # type: Set[str]
+            for setting in definition.definitions:
+                self._addSetting(setting, False, keys, visit)
+            self._selections[definition_id] = (frozenset(keys), frozenset(visit))
+        return self._selections[definition_id]
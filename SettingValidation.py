@@ -0,0 +1,148 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy
+
+from UM.Logger import Logger
+from UM.Settings.SettingFunction import SettingFunction
+
+
+class SettingIndex:
+    """Type and enum options of every setting of a machine definition.
+
+    Built once per definition by walking the setting tree, then shared by every validation.
+    """
+
+    _indexes = {}  # type: Dict[str, SettingIndex]
+
+    @classmethod
+    def forStack(cls, global_stack) -> "SettingIndex":
+        definition = global_stack.definition
+        definition_id = definition.getId()
+        if definition_id not in cls._indexes:
+            cls._indexes[definition_id] = SettingIndex(definition)
+        return cls._indexes[definition_id]
+
+    def __init__(self, definition) -> None:
+        self._types = {}  # type: Dict[str, str]
+        self._labels = {}  # type: Dict[str, str]
+        self._options = {}  # type: Dict[str, FrozenSet[str]]
+        self._categories = {}  # type: Dict[str, str]
+        for setting in definition.definitions:
+            self._addSetting(setting, setting.key)
+
+    def _addSetting(self, setting, category: str) -> None:
+        self._types[setting.key] = str(setting.type)
+        self._categories[setting.key] = category
+        self._labels[setting.key] = str(setting.label)
+        if setting.type == "enum":
+            self._options[setting.key] = frozenset(setting.options.keys())
+        for child in setting.children:
+            self._addSetting(child, category)
+
+    def getType(self, key: str) -> Optional[str]:
+        return self._types.get(key)
+
+    def getLabel(self, key: str) -> Optional[str]:
+        return self._labels.get(key)
+
+    def getOptions(self, key: str) -> Optional[FrozenSet[str]]:
+        return self._options.get(key)
+
+    def getCategory(self, key: str) -> Optional[str]:
+        return self._categories.get(key)
+
+    def hasKey(self, key: str) -> bool:
+        return key in self._types
+
+
+_LIMIT_PROPERTIES = ("minimum_value", "maximum_value", "minimum_value_warning", "maximum_value_warning")
+
+
+def _toFloat(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return numpy.nan
+
+
+def checkValue(index: SettingIndex, kkey: str, ktype: str, kvalue: Any) -> Optional[str]:
+    """Check the type, the enum option or the kind of value of one row of a known setting.
+
+    The limits depend on the printer and are checked apart.
+
+    :return: The error of the row, None if the value can be written.
+    """
+    setting_type = index.getType(kkey)
+    if ktype != setting_type:
+        return "%s : type %s expected, got %s" % (kkey, setting_type, ktype)
+    if isinstance(kvalue, SettingFunction):
+        # Formulas are evaluated by Cura, the result can't be checked before the merge
+        return None
+    if ktype == "enum":
+        if kvalue not in index.getOptions(kkey):
+            return "%s : '%s' is not a valid option" % (kkey, kvalue)
+    elif ktype == "bool":
+        if not isinstance(kvalue, bool):
+            return "%s : '%s' is not True or False" % (kkey, kvalue)
+    elif ktype in ("int", "float"):
+        if not isinstance(kvalue, (int, float)):
+            return "%s : '%s' is not a number" % (kkey, kvalue)
+    return None
+
+
+def validateChanges(changes, global_stack) -> Tuple[List[str], List[str]]:
+    """Check a parsed change set against the setting definitions of a printer before it is applied.
+
+    The types and enum options come from the setting index, the limits are evaluated on the
+    stack of the extruder they are for, then all the numerical rows are checked at once.
+
+    :return: The list of errors and the list of warnings, one line per invalid row.
+    """
+    index = SettingIndex.forStack(global_stack)
+    extruders = global_stack.extruderList
+
+    errors = []  # type: List[str]
+    warnings = []  # type: List[str]
+
+    numeric_keys = []  # type: List[str]
+    values = []  # type: List[float]
+    limits = []  # type: List[Tuple[float, float, float, float]]
+
+    for row in changes:
+        extrud, kkey, ktype, kvalue = row.extruder, row.key, row.type, row.value
+        setting_type = index.getType(kkey)
+        if setting_type is None or setting_type == "category":
+            # Not a setting of this printer, ignored by the import
+            continue
+        error = checkValue(index, kkey, ktype, kvalue)
+        if error is not None:
+            errors.append(error)
+            continue
+        if ktype in ("int", "float") and not isinstance(kvalue, SettingFunction):
+            if extrud < 0 or extrud >= len(extruders):
+                continue
+            extruder = extruders[extrud]
+            numeric_keys.append(kkey)
+            values.append(float(kvalue))
+            limits.append(tuple(_toFloat(extruder.getProperty(kkey, limit)) for limit in _LIMIT_PROPERTIES))
+
+    if numeric_keys:
+        value_array = numpy.array(values, dtype = numpy.float64)
+        limit_array = numpy.array(limits, dtype = numpy.float64)
+        # Comparisons with NaN (no limit defined) are always False
+        with numpy.errstate(invalid = "ignore"):
+            out_of_range = (value_array < limit_array[:, 0]) | (value_array > limit_array[:, 1])
+            out_of_warning = (value_array < limit_array[:, 2]) | (value_array > limit_array[:, 3])
+        for row in numpy.flatnonzero(out_of_range):
+            errors.append("%s : %s is out of range [%s, %s]" % (numeric_keys[row], values[row], limits[row][0], limits[row][1]))
+        for row in numpy.flatnonzero(out_of_warning & ~out_of_range):
+            warnings.append("%s : %s is outside of the recommended range [%s, %s]" % (numeric_keys[row], values[row], limits[row][2], limits[row][3]))
+
+    if errors:
+        Logger.log("w", "Validation errors : %s", errors)
+    if warnings:
+        Logger.log("d", "Validation warnings : %s", warnings)
+    return errors, warnings
@@ -0,0 +1,137 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import hashlib
+import json
+import os
+import zlib
+
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+from UM.Logger import Logger
+
+from .ProfileModel import ProfileTable, SettingRow
+
+# One snapshot of the list : (snapshot id, date, reason, profile, machine)
+SnapshotInfo = Tuple[str, str, str, str, str]
+
+
+class SnapshotStore:
+    """History of the active profile, stored by content.
+
+    The settings of a snapshot are split in chunks, one per extruder and section. A chunk is
+    stored once, named by the hash of its content, and shared by all the snapshots where this
+    section didn't change. A snapshot itself is a small manifest listing its chunks. Prune drops
+    the oldest snapshots and the chunks no longer used.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._objects_path = os.path.join(path, "objects")
+        self._snapshots_path = os.path.join(path, "snapshots")
+        os.makedirs(self._objects_path, exist_ok = True)
+        os.makedirs(self._snapshots_path, exist_ok = True)
+        # Chunks already read or written : hash -> rows
+        self._chunks = {}  # type: Dict[str, List[List[Any]]]
+
+    def _chunkPath(self, chunk_hash: str) -> str:
+        return os.path.join(self._objects_path, chunk_hash[:2], chunk_hash[2:])
+
+    def _writeChunk(self, rows: List[List[Any]]) -> str:
+        data = json.dumps(rows, separators = (",", ":")).encode("utf-8")
+        chunk_hash = hashlib.sha1(data).hexdigest()
+        if chunk_hash in self._chunks:
+            return chunk_hash
+        chunk_path = self._chunkPath(chunk_hash)
+        if not os.path.exists(chunk_path):
+            os.makedirs(os.path.dirname(chunk_path), exist_ok = True)
+            temporary_path = chunk_path + ".tmp"
+            with open(temporary_path, "wb") as chunk_file:
+                chunk_file.write(zlib.compress(data))
+            os.replace(temporary_path, chunk_path)
+        self._chunks[chunk_hash] = rows
+        return chunk_hash
+
+    def _readChunk(self, chunk_hash: str) -> List[List[Any]]:
+        if chunk_hash not in self._chunks:
+            with open(self._chunkPath(chunk_hash), "rb") as chunk_file:
+                self._chunks[chunk_hash] = json.loads(zlib.decompress(chunk_file.read()).decode("utf-8"))
+        return self._chunks[chunk_hash]
+
+    def save(self, table: ProfileTable, reason: str) -> str:
+        """Store the settings of a table.
+
+        :return: The id of the new snapshot.
+        """
+        sections = {}  # type: Dict[Tuple[int, str], List[List[Any]]]
+        for row in table.rows:
+            sections.setdefault((row.extruder, row.section), []).append([row.extruder, row.section, row.key, row.type, row.label, str(row.value), row.source])
+        now = datetime.now()
+        manifest = {
+            "date": now.isoformat(timespec = "seconds"),
+            "reason": reason,
+            "general": [[row.key, row.type, row.label, str(row.value)] for row in table.general],
+            "chunks": [self._writeChunk(rows) for rows in sections.values()]
+        }
+        snapshot_id = now.strftime("%Y%m%d-%H%M%S-%f")
+        with open(os.path.join(self._snapshots_path, snapshot_id + ".json"), "w", encoding = "utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        Logger.log("d", "Snapshot %s (%s) : %d chunks", snapshot_id, reason, len(manifest["chunks"]))
+        return snapshot_id
+
+    def prune(self, keep: int) -> int:
+        """Remove the snapshots older than the keep most recent ones, then the chunks they used alone.
+
+        :return: The number of snapshots removed.
+        """
+        file_names = sorted((file_name for file_name in os.listdir(self._snapshots_path) if file_name.endswith(".json")), reverse = True)
+        if len(file_names) <= keep:
+            return 0
+        for file_name in file_names[keep:]:
+            os.remove(os.path.join(self._snapshots_path, file_name))
+
+        used = set()  # type: Set[str]
+        for file_name in file_names[:keep]:
+            try:
+                with open(os.path.join(self._snapshots_path, file_name), encoding = "utf-8") as manifest_file:
+                    used.update(json.load(manifest_file)["chunks"])
+            except (OSError, ValueError, KeyError):
+                Logger.log("w", "Invalid snapshot %s", file_name)
+        removed_chunks = 0
+        for folder in os.listdir(self._objects_path):
+            for name in os.listdir(os.path.join(self._objects_path, folder)):
+                if folder + name not in used:
+                    os.remove(os.path.join(self._objects_path, folder, name))
+                    self._chunks.pop(folder + name, None)
+                    removed_chunks += 1
+        Logger.log("d", "Snapshots pruned : %d snapshots, %d chunks removed", len(file_names) - keep, removed_chunks)
+        return len(file_names) - keep
+
+    def snapshots(self) -> List[SnapshotInfo]:
+        """The snapshots, the most recent first."""
+        result = []  # type: List[SnapshotInfo]
+        for file_name in sorted(os.listdir(self._snapshots_path), reverse = True):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._snapshots_path, file_name), encoding = "utf-8") as manifest_file:
+                    manifest = json.load(manifest_file)
+            except (OSError, ValueError):
+                Logger.log("w", "Invalid snapshot %s", file_name)
+                continue
+            general = {row[0]: row[3] for row in manifest["general"]}
+            result.append((file_name[:-5], manifest["date"], manifest["reason"], general.get("Profile", ""), general.get("Machine", "")))
+        return result
+
+    def load(self, snapshot_id: str) -> ProfileTable:
+        """The settings of a snapshot, with the values as strings like in a CSV file."""
+        with open(os.path.join(self._snapshots_path, snapshot_id + ".json"), encoding = "utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        table = ProfileTable()
+        for key, ktype, label, value in manifest["general"]:
+            table.addGeneral(key, value, ktype, label)
+        for chunk_hash in manifest["chunks"]:
+            for row in self._readChunk(chunk_hash):
+                extruder, section, key, ktype, label, value, source = row
+                table.append(SettingRow(section, extruder, key, ktype, label, value, source))
+        return table
@@ -0,0 +1,125 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+
+import re
+
+from fnmatch import translate
+from typing import Dict, List, Optional, Pattern, Tuple
+
+import numpy
+
+from UM.Logger import Logger
+
+from .ProfileModel import ProfileTable, SettingRow
+
+
+class TransformRules:
+    """Rules applied to the values of a file before they are merged, one rule per line.
+
+    scale <pattern> <factor>  : multiply the numerical settings matching the pattern
+    add <pattern> <value>     : add a value to the numerical settings matching the pattern
+    extruder <file> <machine> : the values of an extruder of the file go to another extruder
+                                (1 for the first extruder). If another extruder of the file
+                                gives the same setting, the value of the rule is kept.
+
+    A pattern is a glob (speed_*) or a regular expression prefixed by re:. Lines starting with
+    # are comments. The rules matching a key are combined once in a single factor and offset,
+    then all the numerical values are transformed at once.
+    """
+
+    def __init__(self, text: str) -> None:
+        """:raise ValueError: If a line can't be read, with its line number."""
+        self._rules = []  # type: List[Tuple[Pattern, str, float]]
+        self._extruders = {}  # type: Dict[int, int]
+        # Key -> combined (factor, offset), None if no rule matches
+        self._transforms = {}  # type: Dict[str, Optional[Tuple[float, float]]]
+        for line_number, line in enumerate(text.splitlines(), 1):
+            words = line.split("#")[0].split()
+            if not words:
+                continue
+            try:
+                operation, first, second = words
+                operation = operation.lower()
+                if operation == "extruder":
+                    self._extruders[int(first) - 1] = int(second) - 1
+                elif operation in ("scale", "add"):
+                    pattern = re.compile(first[3:] if first.startswith("re:") else translate(first))
+                    self._rules.append((pattern, operation, float(second)))
+                else:
+                    raise ValueError("unknown operation %s" % operation)
+            except (ValueError, re.error) as e:
+                raise ValueError("Line %d : %s (%s)" % (line_number, line.strip(), e))
+
+    def isEmpty(self) -> bool:
+        return not self._rules and not self._extruders
+
+    def _mapExtruders(self, table: ProfileTable) -> None:
+        # (extruder, key) -> (position in the kept rows, moved by a rule)
+        kept_rows = {}  # type: Dict[Tuple[int, str], Tuple[int, bool]]
+        rows = []  # type: List[SettingRow]
+        for row in table.rows:
+            mapped = row.extruder in self._extruders
+            row.extruder = self._extruders.get(row.extruder, row.extruder)
+            kept = kept_rows.get((row.extruder, row.key))
+            if kept is None:
+                kept_rows[(row.extruder, row.key)] = (len(rows), mapped)
+                rows.append(row)
+                continue
+            # The same value given by both extruders is not a conflict
+            if str(row.value) != str(rows[kept[0]].value):
+                table.conflicts.add("%s (%d)" % (row.key, row.extruder + 1))
+            if mapped and not kept[1]:
+                rows[kept[0]] = row
+                kept_rows[(row.extruder, row.key)] = (kept[0], True)
+        table.rows = rows
+        if table.conflicts:
+            Logger.log("w", "Transform rules : several extruders give %s", sorted(table.conflicts))
+
+    def _transform(self, key: str) -> Optional[Tuple[float, float]]:
+        if key not in self._transforms:
+            factor, offset, found = 1.0, 0.0, False
+            for pattern, operation, operand in self._rules:
+                if pattern.match(key) is None:
+                    continue
+                found = True
+                if operation == "scale":
+                    factor, offset = factor * operand, offset * operand
+                else:
+                    offset += operand
+            self._transforms[key] = (factor, offset) if found else None
+        return self._transforms[key]
+
+    def apply(self, table: ProfileTable) -> int:
+        """Transform the rows of a table in place.
+
+        The settings given twice for an extruder by the extruder rules, with different values,
+        are added to the conflicts of the table, with the extruder number (speed_print (1)).
+
+        :return: The number of values changed by the scale & add rules.
+        """
+        if self._extruders:
+            self._mapExtruders(table)
+        rows = table.rows
+
+        selected = []  # type: List[SettingRow]
+        values = []  # type: List[float]
+        transforms = []  # type: List[Tuple[float, float]]
+        for row in rows:
+            # Formulas and invalid values are left as they are
+            if row.type not in ("int", "float") or isinstance(row.value, bool) or not isinstance(row.value, (int, float)):
+                continue
+            transform = self._transform(row.key)
+            if transform is None:
+                continue
+            selected.append(row)
+            values.append(float(row.value))
+            transforms.append(transform)
+        if not selected:
+            return 0
+
+        transform_array = numpy.array(transforms, dtype = numpy.float64)
+        results = numpy.array(values, dtype = numpy.float64) * transform_array[:, 0] + transform_array[:, 1]
+        for row, result in zip(selected, results.tolist()):
+            row.value = int(round(result)) if row.type == "int" else round(result, 4)
+        Logger.log("d", "Transform rules : %d values changed", len(selected))
+        return len(selected)
@@ -7,4 +7,5 @@ def getMetaData():
     return {}
 
 def register(app):
+    # The other plugins get the profile service with getPluginObject("ImportExportProfiles").getService()
     return {"extension": ImportExportProfiles.ImportExportProfiles()}
@@ -0,0 +1,97 @@
+# Copyright (c) 2022 5@xes
+# ImportExportProfiles is released under the terms of the AGPLv3 or higher.
+#
+# Run from the plugin folder, with Uranium in the path : python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+
+try:
+    from UM.Settings.SettingFunction import SettingFunction
+except ImportError:
+    raise unittest.SkipTest("Uranium is not available")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from OverridePruning import findRedundantOverrides
+
+
+class _Container:
+    def __init__(self, container_id, values):
+        self._id = container_id
+        self._values = values
+
+    def getId(self):
+        return self._id
+
+    def getAllKeys(self):
+        return set(self._values)
+
+    def hasProperty(self, key, property_name):
+        return property_name == "value" and key in self._values
+
+    def getProperty(self, key, property_name):
+        return self._values.get(key) if property_name == "value" else None
+
+    def serialize(self):
+        return "".join("%s = %s\n" % item for item in self._values.items())
+
+
+class _Stack:
+    """The containers of a stack, the top container first, evaluated like a ContainerStack."""
+
+    def __init__(self, containers, quality_changes_index = 0):
+        self._containers = containers
+        self.qualityChanges = containers[quality_changes_index]
+
+    def getContainerIndex(self, container):
+        return self._containers.index(container)
+
+    def getRawProperty(self, key, property_name, context = None):
+        start = context.context.get("evaluate_from_container_index", 0) if context is not None else 0
+        for container in self._containers[start:]:
+            if container.hasProperty(key, property_name):
+                return container.getProperty(key, property_name)
+        return None
+
+    def getProperty(self, key, property_name, context = None):
+        value = self.getRawProperty(key, property_name, context)
+        if isinstance(value, SettingFunction):
+            return value(self, context)
+        return value
+
+
+class TestFindRedundantOverrides(unittest.TestCase):
+    def test_sameValueAsQuality(self):
+        quality_changes = _Container("custom", {"speed_print": 50})
+        stack = _Stack([quality_changes, _Container("quality", {"speed_print": 50})])
+
+        self.assertEqual(findRedundantOverrides(stack).keys, ["speed_print"])
+
+    def test_formulaBelowUsesTheOtherOverrides(self):
+        # Without its override, speed_infill follows speed_print = 60 of the custom profile, not 50
+        quality_changes = _Container("custom", {"speed_print": 60, "speed_infill": 50})
+        quality = _Container("quality", {"speed_print": 50, "speed_infill": SettingFunction("speed_print")})
+        stack = _Stack([quality_changes, quality])
+
+        self.assertEqual(findRedundantOverrides(stack).keys, [])
+
+    def test_formulaBelowGivesTheSameValue(self):
+        quality_changes = _Container("custom", {"speed_print": 60, "speed_infill": 60})
+        quality = _Container("quality", {"speed_print": 50, "speed_infill": SettingFunction("speed_print")})
+        stack = _Stack([quality_changes, quality])
+
+        self.assertEqual(findRedundantOverrides(stack).keys, ["speed_infill"])
+
+    def test_formulaBelowIgnoresTheUserChanges(self):
+        # The unsaved user value speed_print = 60 must not make the saved override redundant
+        user_changes = _Container("user", {"speed_print": 60})
+        quality_changes = _Container("custom", {"speed_infill": 60})
+        quality = _Container("quality", {"speed_print": 50, "speed_infill": SettingFunction("speed_print")})
+        stack = _Stack([user_changes, quality_changes, quality], quality_changes_index = 1)
+
+        self.assertEqual(findRedundantOverrides(stack).keys, [])
+
+
+if __name__ == "__main__":
+    unittest.main()